@@ -61,7 +61,7 @@ INSTALLED_APPS = [
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'User_Auth.authentication.CachedJWTAuthentication',
     )
 }
 
@@ -190,11 +190,87 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=30),  # Longer-lived refresh token
     'ROTATE_REFRESH_TOKENS': True,  # Enable refresh token rotation
     'BLACKLIST_AFTER_ROTATION': True,  # Blacklist the refresh token after use
+    'TOKEN_REFRESH_SERIALIZER': 'User_Auth.serializers.IndexedTokenRefreshSerializer',
 }
 
+# How often (seconds) each process pulls newly blacklisted JTIs into its index
+TOKEN_BLACKLIST_SYNC_SECONDS = 5
+# How long (seconds) ids skipped by that sync are re-checked, in case their
+# transaction commits after rows with higher ids (see User_Auth.tokens)
+TOKEN_BLACKLIST_GAP_SECONDS = 60
+
+# Worker processes used by the async login view to verify password hashes
+LOGIN_HASH_WORKERS = os.cpu_count()
+
+# Per-process cache of authenticated users (see User_Auth.authentication)
+AUTH_USER_CACHE_SIZE = 10000
+AUTH_USER_CACHE_TTL = 60  # seconds
+
+# Full rebuild interval of the in-process xp leaderboard (User_Auth.leaderboard)
+LEADERBOARD_REBUILD_SECONDS = 300
+
+# Hearts regenerate lazily: one every HEARTS_REGEN_SECONDS up to HEARTS_MAX
+HEARTS_MAX = 5
+HEARTS_REGEN_SECONDS = 1800
+
+# Campaign grants queued through the API are run by a worker:
+#   python manage.py grant_campaign --pending --every 10
+# A running campaign that hasn't checkpointed for this long is taken over.
+CAMPAIGN_RUN_STALE_SECONDS = 300
+
+# Applied progress events are kept this long for de-duplicating client
+# retries, then removed by `manage.py prune_progress_events`.
+PROGRESS_EVENT_RETENTION_DAYS = 30
+
+# Level curve: xp for level n is LEVEL_BASE_XP * n ** LEVEL_EXPONENT, up to
+# LEVEL_MAX. Set LEVEL_XP_THRESHOLDS to an explicit ascending list instead to
+# override it. Run `manage.py recompute_levels` after changing the curve.
+LEVEL_BASE_XP = 100
+LEVEL_EXPONENT = 1.5
+LEVEL_MAX = 100
+
+
+# Caches shared by every worker process. The database backend needs
+# `manage.py createcachetable`; point these at Redis/Memcached in production.
+# Profiles and OTPs get their own aliases so snapshots can't evict OTP codes.
+# Process-local backends (locmem, dummy) are rejected by a system check.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "cache_default",
+    },
+    "otp": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "cache_otp",
+        "OPTIONS": {"MAX_ENTRIES": 100000},
+    },
+    "profiles": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "cache_profiles",
+        "OPTIONS": {"MAX_ENTRIES": 1000000},
+    },
+}
+
+# Profile versions and GET profile/ snapshots (User_Auth.versions/snapshots).
+# Snapshots live PROFILE_SNAPSHOT_TTL seconds and are replaced as soon as the
+# profile changes.
+PROFILE_CACHE_ALIAS = "profiles"
+PROFILE_SNAPSHOT_TTL = 300
+
+# How often (seconds) each process checks the catalog version token in
+# CACHES[CATALOG_CACHE_ALIAS] for shop edits made by other processes (shop.catalog)
+CATALOG_CACHE_ALIAS = "default"
+CATALOG_VERSION_CHECK_SECONDS = 5
+
 
 AUTH_USER_MODEL = 'User_Auth.CustomUser'
 
+# Key for the referral code permutation, kept apart from SECRET_KEY so that
+# rotating the secret doesn't change how codes are derived. Never change it
+# once codes have been issued: new codes could collide with existing ones.
+# (Its value is the SECRET_KEY the existing codes were issued with.)
+REFERRAL_CODE_KEY = "django-insecure-^s$r&n8)eds@t!sta&0^_$4!^0(z#3!53-71ky4l_)epd679h3"
+
 
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
@@ -204,6 +280,22 @@ EMAIL_HOST_USER = 'girishh.moo@gmail.com'  # Replace with your Gmail
 EMAIL_HOST_PASSWORD = 'rxpp isdn lcyr ssze'  
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Background mail delivery (User_Auth.mail_queue); set MAIL_QUEUE_ENABLED = False
+# to send inline, e.g. in tests with the locmem backend
+MAIL_QUEUE_ENABLED = True
+MAIL_QUEUE_WORKERS = 2
+MAIL_QUEUE_BATCH_SIZE = 20
+MAIL_QUEUE_MAX_RETRIES = 3
+MAIL_QUEUE_RETRY_BACKOFF = 2  # seconds, doubled on each retry
+
+# OTP storage for send-otp/verify-otp. CacheOTPStore is shared by every worker
+# using the same cache (see CACHES above); LocalOTPStore keeps codes
+# in-process for single-worker setups.
+OTP_STORE = 'User_Auth.otp_store.CacheOTPStore'
+OTP_CACHE_ALIAS = 'otp'
+OTP_TTL_SECONDS = 300
+OTP_MAX_ATTEMPTS = 5
+
 
 import cloudinary
 import cloudinary.uploader
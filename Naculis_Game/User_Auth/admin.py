@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, UserProfile, UserDiscount
+from .models import CustomUser, UserProfile, UserDiscount, LedgerEntry, CampaignRun
 
 # Custom filter for SuperUsers
 class SuperUserFilter(admin.SimpleListFilter):
@@ -53,6 +53,7 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'first_name', 'last_name', 'referral_code', 'referral_link', 'referred_by', 'gender', 'country', 'is_fully_filled']
     list_filter = ['gender', 'country']
     search_fields = ['user__email', 'user__username']
+    readonly_fields = ['balance', 'gem']  # snapshots; adjust them with a LedgerEntry
 
     def referral_code(self, obj):
         """Return the referral code of the user"""
@@ -75,3 +76,24 @@ class UserDiscountAdmin(admin.ModelAdmin):
         return obj.user_profile.user.username
     username.short_description = "User"
 
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ['user_profile', 'balance_delta', 'gem_delta', 'reason', 'folded', 'created_at']
+    list_filter = ['folded']
+    search_fields = ['user_profile__user__email', 'user_profile__user__username', 'reason']
+    readonly_fields = ['folded']
+
+    def has_change_permission(self, request, obj=None):
+        return obj is None  # append-only: correct mistakes with a new entry
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(CampaignRun)
+class CampaignRunAdmin(admin.ModelAdmin):
+    list_display = ['campaign_id', 'percent', 'status', 'last_id', 'updated_at', 'finished_at']
+    list_filter = ['status']
+    search_fields = ['campaign_id']
+    readonly_fields = ['status', 'last_id', 'error', 'updated_at', 'finished_at']
@@ -6,4 +6,5 @@ class UserAuthConfig(AppConfig):
     name = 'User_Auth'
 
     def ready(self):
-        import User_Auth.signals  
\ No newline at end of file
+        import User_Auth.signals
+        import User_Auth.checks  
\ No newline at end of file
@@ -0,0 +1,99 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+
+class UserCache:
+    """
+    Bounded LRU cache of users (with their profile attached) keyed by user id.
+    Entries expire after ``ttl`` seconds so changes made by other worker
+    processes are picked up eventually; changes made in this process are
+    dropped immediately by the signal handlers in ``signals.py``.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+        # Hand out a copy so views mutating request.user never touch the cache.
+        return copy.deepcopy(user)
+
+    def set(self, user_id, user):
+        user_id, user = str(user_id), copy.deepcopy(user)
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache(
+    maxsize=getattr(settings, "AUTH_USER_CACHE_SIZE", 10000),
+    ttl=getattr(settings, "AUTH_USER_CACHE_TTL", 60),
+)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the user and ``userprofile`` from
+    ``user_cache`` instead of querying them on every request.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = user_cache.get(user_id)
+        if user is None:
+            try:
+                user = (
+                    self.user_model.objects
+                    .select_related("userprofile")
+                    .get(**{api_settings.USER_ID_FIELD: user_id})
+                )
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            user_cache.set(user_id, user)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            from rest_framework_simplejwt.utils import get_md5_hash_password
+
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
@@ -0,0 +1,171 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, Max, OuterRef, Q
+from django.utils import timezone
+
+from .models import CampaignRun, UserProfile, UserDiscount
+from .versions import bump_all_profile_versions
+
+
+logger = logging.getLogger(__name__)
+
+
+class CampaignRunning(Exception):
+    """The campaign already has a run in progress."""
+
+
+def campaign_targets(country=None, min_level=None, max_level=None):
+    """Profiles a campaign is aimed at; every filter is optional."""
+    profiles = UserProfile.objects.all()
+    if country:
+        profiles = profiles.filter(country=country)
+    if min_level is not None:
+        profiles = profiles.filter(level__gte=min_level)
+    if max_level is not None:
+        profiles = profiles.filter(level__lte=max_level)
+    return profiles
+
+
+def grant_campaign(campaign_id, percent, reason, targets, expires_at=None, batch_size=5000, progress=None, start_id=0):
+    """
+    Give every profile in ``targets`` one discount tagged ``campaign_id``,
+    valid until ``expires_at`` (None for never).
+
+    Walks the targets in id order, ``batch_size`` at a time. Each chunk is
+    one INSERT ... SELECT over the targets queryset that skips profiles
+    already holding this campaign's discount, so nothing is loaded into
+    Python and re-running a campaign only fills in what is missing (an
+    interrupted grant is resumed by running it again). The
+    (campaign_id, user_profile) constraint backs this up against two runs
+    of the same campaign racing. ``progress(granted, last_id)`` is called
+    after each chunk, the last one included; ``start_id`` skips targets up to that id. Returns the
+    number of discounts inserted.
+    """
+    already_granted = UserDiscount.objects.filter(campaign_id=campaign_id, user_profile=OuterRef('pk'))
+    pending = targets.alias(granted=Exists(already_granted)).filter(granted=False).order_by('id')
+    table = connection.ops.quote_name(UserDiscount._meta.db_table)
+    last_id = start_id
+    granted = 0
+
+    while True:
+        # The chunk's upper bound; the chunk itself never leaves the database.
+        bounds = list(pending.filter(id__gt=last_id).values_list('id', flat=True)[batch_size - 1:batch_size])
+        chunk = pending.filter(id__gt=last_id)
+        if bounds:
+            chunk = chunk.filter(id__lte=bounds[0])
+        select_sql, select_params = chunk.order_by().values('id').query.sql_with_params()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (user_profile_id, percent, reason, used, granted_at, expires_at, campaign_id)
+                SELECT target.id, %s, %s, %s, %s, %s, %s FROM ({select_sql}) target
+                """,
+                [percent, reason, False, timezone.now(), expires_at, campaign_id, *select_params],
+            )
+            granted += cursor.rowcount
+            if cursor.rowcount:
+                # Too many profiles to bump one by one; start a new epoch instead.
+                bump_all_profile_versions()
+        if bounds:
+            last_id = bounds[0]
+        else:
+            # The last chunk ran to the end of the targets.
+            last_id = targets.filter(id__gt=last_id).aggregate(last=Max('id'))['last'] or last_id
+        if progress:
+            progress(granted, last_id)
+        if not bounds:
+            return granted
+
+
+def campaign_size(campaign_id):
+    return UserDiscount.objects.filter(campaign_id=campaign_id).count()
+
+
+# Run state. A run is executed by whichever worker claims it first; a
+# running one that hasn't checkpointed for CAMPAIGN_RUN_STALE_SECONDS is
+# assumed dead and can be claimed again.
+
+def _claimable():
+    stale_before = timezone.now() - timedelta(seconds=getattr(settings, "CAMPAIGN_RUN_STALE_SECONDS", 300))
+    return Q(status=CampaignRun.PENDING) | Q(status=CampaignRun.RUNNING, updated_at__lt=stale_before)
+
+
+def queue_campaign(campaign_id, percent, reason='', country='', min_level=None, max_level=None, expires_at=None):
+    """
+    Record a campaign grant for a worker to run, or re-queue an existing one
+    with these parameters (granting is idempotent, so it starts over from
+    the first profile). Raises CampaignRunning while a live run holds it.
+    """
+    params = {
+        'percent': percent, 'reason': reason, 'country': country or '',
+        'min_level': min_level, 'max_level': max_level, 'expires_at': expires_at,
+    }
+    with transaction.atomic():
+        run, created = CampaignRun.objects.select_for_update().get_or_create(campaign_id=campaign_id, defaults=params)
+        if not created:
+            if run.status == CampaignRun.RUNNING and not CampaignRun.objects.filter(_claimable(), pk=run.pk).exists():
+                raise CampaignRunning(campaign_id)
+            for field, value in params.items():
+                setattr(run, field, value)
+            run.status = CampaignRun.PENDING
+            run.last_id = 0
+            run.error = ''
+            run.finished_at = None
+            run.updated_at = timezone.now()
+            run.save()
+    return run
+
+
+def claimable_runs():
+    return CampaignRun.objects.filter(_claimable()).order_by('created_at')
+
+
+class _RunLost(Exception):
+    """Another worker reclaimed the run (this one looked dead)."""
+
+
+def execute_run(run, batch_size=5000, progress=None):
+    """
+    Claim ``run`` and grant it, resuming after ``run.last_id``. Returns
+    False if another worker claimed it first or reclaimed it midway. Each
+    chunk is checkpointed on the run row; ``updated_at`` doubles as the
+    claim token, so a worker whose run was reclaimed stops at its next
+    checkpoint. An error marks the run failed and is re-raised.
+    """
+    heartbeat = timezone.now()
+    if not CampaignRun.objects.filter(_claimable(), pk=run.pk).update(status=CampaignRun.RUNNING, updated_at=heartbeat):
+        return False
+    run.refresh_from_db()
+
+    def finish(**fields):
+        now = timezone.now()
+        return CampaignRun.objects.filter(pk=run.pk, updated_at=heartbeat).update(
+            updated_at=now, finished_at=now, **fields
+        )
+
+    def checkpoint(granted, last_id):
+        nonlocal heartbeat
+        now = timezone.now()
+        if not CampaignRun.objects.filter(pk=run.pk, updated_at=heartbeat).update(last_id=last_id, updated_at=now):
+            raise _RunLost(run.campaign_id)
+        heartbeat = now
+        if progress:
+            progress(granted, last_id)
+
+    targets = campaign_targets(country=run.country, min_level=run.min_level, max_level=run.max_level)
+    try:
+        grant_campaign(
+            run.campaign_id, run.percent, run.reason, targets, expires_at=run.expires_at,
+            batch_size=batch_size, progress=checkpoint, start_id=run.last_id,
+        )
+    except _RunLost:
+        logger.warning("campaign_reclaimed campaign_id=%s", run.campaign_id)
+        return False
+    except Exception as exc:
+        logger.exception("campaign_failed campaign_id=%s", run.campaign_id)
+        finish(status=CampaignRun.FAILED, error=repr(exc))
+        raise
+    return bool(finish(status=CampaignRun.DONE))
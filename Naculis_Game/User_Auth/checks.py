@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from .otp_store import CacheOTPStore, otp_store_class
+
+
+PROCESS_LOCAL_BACKENDS = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+@register(Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    """
+    Profile versions/snapshots and OTPs must be visible to every worker: a
+    per-process cache would keep serving a stale profile (and 304s) on the
+    workers that didn't see a write, and reject OTPs issued by another one.
+    """
+    aliases = {getattr(settings, "PROFILE_CACHE_ALIAS", "default"): "profile snapshots"}
+    if issubclass(otp_store_class(), CacheOTPStore):
+        aliases.setdefault(getattr(settings, "OTP_CACHE_ALIAS", "default"), "OTPs")
+    errors = []
+    for alias, used_for in aliases.items():
+        backend = settings.CACHES.get(alias, {}).get("BACKEND")
+        if backend is None or backend in PROCESS_LOCAL_BACKENDS:
+            errors.append(Error(
+                f"CACHES['{alias}'] (used for {used_for}) must be a backend shared by all worker processes.",
+                hint="Use the database, Redis or Memcached cache backend.",
+                id="User_Auth.E001",
+            ))
+    return errors
+
+
+@register
+def check_referral_code_key(app_configs, **kwargs):
+    """Referral codes are derived from REFERRAL_CODE_KEY; there is no fallback."""
+    if not getattr(settings, "REFERRAL_CODE_KEY", None):
+        return [Error(
+            "REFERRAL_CODE_KEY must be set.",
+            hint="Use a dedicated, stable secret; it must never change once codes have been issued.",
+            id="User_Auth.E002",
+        )]
+    return []
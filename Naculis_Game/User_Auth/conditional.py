@@ -0,0 +1,63 @@
+import hashlib
+
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+
+from .versions import profile_version
+
+
+class _NotModified(Exception):
+    pass
+
+
+class ConditionalGetMixin:
+    """
+    ETag / If-None-Match support for APIViews whose GET output depends only
+    on the requesting user's data.
+
+    The ETag is derived from the user's profile version (versions.py) plus
+    whatever ``get_etag_parts()`` adds, so it costs a cache lookup rather
+    than a render. It is checked in ``initial()``, right after
+    authentication, so a matching If-None-Match gets a 304 before the
+    handler queries or serializes anything. ``get_etag_parts()`` returning
+    None turns the check off for that request.
+
+    Handlers should build their body from data at least as new as the
+    version read here (i.e. from the database or a version-keyed snapshot,
+    not the process-local user cache), or a stale body could be tagged with
+    a newer version.
+    """
+
+    def get_etag_parts(self, request, *args, **kwargs):
+        return [profile_version(request.user.pk)]
+
+    def _compute_etag(self, request, *args, **kwargs):
+        parts = self.get_etag_parts(request, *args, **kwargs)
+        if parts is None:
+            return None
+        key = "|".join(
+            str(part) for part in
+            [type(self).__name__, request.get_full_path(), request.accepted_renderer.format, *parts]
+        )
+        return f'"{hashlib.sha1(key.encode()).hexdigest()}"'
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = None
+        if request.method in ("GET", "HEAD"):
+            self.etag = self._compute_etag(request, *args, **kwargs)
+            if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+            if self.etag and (self.etag in if_none_match or "*" in if_none_match):
+                raise _NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _NotModified):
+            return Response(status=304)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, "etag", None) and response.status_code in (200, 304):
+            response["ETag"] = self.etag
+            response["Cache-Control"] = "private, no-cache"
+        return response
@@ -0,0 +1,64 @@
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import UserDiscount
+from .versions import bump_profile_versions
+
+
+class DiscountUnavailable(Exception):
+    """Some of the requested discounts are missing, not yours, used or expired."""
+
+    def __init__(self, discount_ids):
+        super().__init__(discount_ids)
+        self.discount_ids = discount_ids
+
+
+def applicable_discounts(profile, now=None):
+    """The profile's unused, unexpired discounts (served by discount_unused_idx)."""
+    now = now or timezone.now()
+    return UserDiscount.objects.filter(user_profile=profile, used=False).filter(
+        Q(expires_at__isnull=True) | Q(expires_at__gt=now)
+    )
+
+
+def best_discount(profile):
+    """
+    The single highest applicable discount, or None. One query that walks
+    the partial index from the top; on a tie the one expiring first wins.
+    """
+    return applicable_discounts(profile).order_by(
+        '-percent', F('expires_at').asc(nulls_last=True), 'id'
+    ).first()
+
+
+def redeem(profile, discount_id):
+    """
+    Mark one of the profile's discounts used. The check and the write are a
+    single ``UPDATE ... WHERE used = false`` (and unexpired), so of two
+    concurrent redemptions exactly one gets the row; no lock outlives the
+    statement.
+    """
+    now = timezone.now()
+    if applicable_discounts(profile, now).filter(pk=discount_id).update(used=True, used_at=now):
+        bump_profile_versions([profile.user_id])
+        return True
+    return False
+
+
+def redeem_many(profile, discount_ids):
+    """
+    Redeem several discounts at once, all or nothing: one conditional UPDATE
+    whose row count must cover every id, otherwise it is rolled back and
+    DiscountUnavailable names the ids that couldn't be redeemed.
+    """
+    discount_ids = set(discount_ids)
+    now = timezone.now()
+    with transaction.atomic():
+        redeemed = applicable_discounts(profile, now).filter(pk__in=discount_ids).update(used=True, used_at=now)
+        if redeemed == len(discount_ids):
+            bump_profile_versions([profile.user_id])
+            return sorted(discount_ids)
+        transaction.set_rollback(True)
+    available = set(applicable_discounts(profile, now).filter(pk__in=discount_ids).values_list('pk', flat=True))
+    raise DiscountUnavailable(sorted(discount_ids - available))
@@ -0,0 +1,121 @@
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import LedgerEntry, UserProfile
+from .signals import notify_profiles_updated
+from .versions import bump_profile_versions
+
+
+Balances = namedtuple('Balances', ['balance', 'gem'])
+
+
+def entry(profile, balance=0, gem=0, reason=''):
+    """An unsaved ledger entry, for callers that bulk_create several."""
+    return LedgerEntry(
+        user_profile_id=profile.pk, balance_delta=Decimal(balance), gem_delta=gem, reason=reason
+    )
+
+
+def credit(profile, balance=0, gem=0, reason=''):
+    """Record a change with a single INSERT; the profile row isn't touched."""
+    ledger_entry = entry(profile, balance, gem, reason)
+    ledger_entry.save()
+    bump_profile_versions([profile.user_id])
+    return ledger_entry
+
+
+def _sum_of(field, entries, output_field):
+    return Coalesce(
+        Subquery(
+            entries.filter(user_profile=OuterRef('pk'))
+            .order_by()
+            .values('user_profile')
+            .annotate(total=Sum(field))
+            .values('total')
+        ),
+        Value(0),
+        output_field=output_field,
+    )
+
+
+def _tail_sums(entries):
+    balance_field = DecimalField(max_digits=12, decimal_places=2)
+    return {
+        'balance_tail': _sum_of('balance_delta', entries, balance_field),
+        'gem_tail': _sum_of('gem_delta', entries, IntegerField()),
+    }
+
+
+def with_balances(profiles):
+    """Annotate each profile with its unfolded ``balance_tail`` and ``gem_tail``."""
+    return profiles.annotate(**_tail_sums(LedgerEntry.objects.filter(folded=False)))
+
+
+def balances(profile):
+    """
+    Live balance and gems: the snapshot plus the unfolded tail, read in one
+    query that only touches unfolded entries (a partial index).
+    """
+    balance, gem, balance_tail, gem_tail = (
+        with_balances(UserProfile.objects.filter(pk=profile.pk))
+        .values_list('balance', 'gem', 'balance_tail', 'gem_tail')
+        .get()
+    )
+    return Balances(balance + balance_tail, gem + gem_tail)
+
+
+def fold(batch_size=5000):
+    """
+    Fold unfolded entries into the profile snapshots, ``batch_size`` entries
+    per transaction: one set-based UPDATE adds each profile's sums, another
+    marks exactly those entries folded. Returns the number folded.
+    """
+    folded = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                LedgerEntry.objects.select_for_update()
+                .filter(folded=False)
+                .order_by('id')
+                .values_list('id', 'user_profile_id')[:batch_size]
+            )
+            if not rows:
+                return folded
+            entry_ids = [entry_id for entry_id, _ in rows]
+            profile_ids = {profile_id for _, profile_id in rows}
+            sums = _tail_sums(LedgerEntry.objects.filter(id__in=entry_ids))
+            UserProfile.objects.filter(pk__in=profile_ids).update(
+                balance=F('balance') + sums['balance_tail'],
+                gem=F('gem') + sums['gem_tail'],
+            )
+            LedgerEntry.objects.filter(id__in=entry_ids).update(folded=True)
+            notify_profiles_updated(
+                UserProfile.objects.filter(pk__in=profile_ids).values_list('user_id', flat=True)
+            )
+        folded += len(rows)
+
+
+def inconsistent_profiles(batch_size=5000):
+    """
+    Yield ``(profile_id, balance, gem, ledger_balance, ledger_gem)`` for
+    every profile whose snapshot differs from the sum of its folded entries,
+    checking ``batch_size`` profiles per query.
+    """
+    last_id = 0
+    while True:
+        rows = list(
+            UserProfile.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .annotate(**_tail_sums(LedgerEntry.objects.filter(folded=True)))
+            .values_list('id', 'balance', 'gem', 'balance_tail', 'gem_tail')[:batch_size]
+        )
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        for profile_id, balance, gem, ledger_balance, ledger_gem in rows:
+            if balance != ledger_balance or gem != ledger_gem:
+                yield profile_id, balance, gem, ledger_balance, ledger_gem
@@ -0,0 +1,63 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _init_worker():
+    """Configure Django inside a freshly spawned hashing worker."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "Naculis_Game.settings")
+    import django
+    django.setup()
+
+
+def _verify(raw_password, encoded):
+    """Runs in the worker: returns (is_correct, needs_rehash)."""
+    from django.contrib.auth.hashers import check_password
+
+    needs_rehash = []
+    is_correct = check_password(raw_password, encoded, setter=needs_rehash.append)
+    return is_correct, bool(needs_rehash)
+
+
+def get_executor():
+    """Return the shared, bounded process pool used for password hashing."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=getattr(settings, "LOGIN_HASH_WORKERS", None) or os.cpu_count(),
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+    return _executor
+
+
+async def acheck_password(user, raw_password):
+    """
+    Async equivalent of ``user.check_password()`` that keeps the event loop
+    free by verifying the hash in the process pool.
+    """
+    loop = asyncio.get_running_loop()
+    is_correct, needs_rehash = await loop.run_in_executor(
+        get_executor(), _verify, raw_password, user.password
+    )
+    if is_correct and needs_rehash:
+        await sync_to_async(_rehash)(user, raw_password)
+    return is_correct
+
+
+def _rehash(user, raw_password):
+    # Same hash upgrade AbstractBaseUser.check_password() performs.
+    user.set_password(raw_password)
+    user._password = None
+    user.save(update_fields=["password"])
@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import UserProfile
+from .signals import notify_profiles_updated
+
+
+class HeartsBusy(Exception):
+    """Spending kept losing compare-and-set races; the caller may retry."""
+
+
+def max_hearts():
+    return getattr(settings, "HEARTS_MAX", 5)
+
+
+def regen_interval():
+    return timedelta(seconds=getattr(settings, "HEARTS_REGEN_SECONDS", 1800))
+
+
+def regenerate(count, refilled_at, now=None):
+    """
+    Apply regeneration to a stored (count, refilled_at) pair and return the
+    current pair. Nothing is written: hearts refill lazily on read.
+    """
+    if refilled_at is None or count >= max_hearts():
+        return count, None
+    now = now or timezone.now()
+    interval = regen_interval()
+    gained = int((now - refilled_at) / interval)
+    if count + gained >= max_hearts():
+        return max_hearts(), None
+    return count + gained, refilled_at + gained * interval
+
+
+def spend_hearts(profile, amount=1, partial=False, attempts=5):
+    """
+    Take ``amount`` hearts from the profile and return how many were spent.
+
+    The write is a compare-and-set UPDATE on the (hearts, hearts_refilled_at)
+    pair that was read, so concurrent spends can never overdraw or lose an
+    update; a lost race is simply retried. Without ``partial`` nothing is
+    spent (0 is returned) unless all ``amount`` hearts are available; with
+    it, as many as are available are spent.
+    """
+    profiles = UserProfile.objects.filter(pk=profile.pk)
+    for _ in range(attempts):
+        stored_count, stored_refilled_at = profiles.values_list('hearts', 'hearts_refilled_at').get()
+        now = timezone.now()
+        count, refilled_at = regenerate(stored_count, stored_refilled_at, now)
+        spent = min(amount, count) if partial else amount
+        if spent <= 0 or spent > count:
+            return 0
+        if refilled_at is None:
+            # Was full, so the regen clock starts now.
+            refilled_at = now
+        if profiles.filter(hearts=stored_count, hearts_refilled_at=stored_refilled_at).update(
+            hearts=count - spent, hearts_refilled_at=refilled_at
+        ):
+            notify_profiles_updated([profile.user_id])
+            return spent
+    raise HeartsBusy()
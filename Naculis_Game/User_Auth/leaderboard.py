@@ -0,0 +1,261 @@
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import connection
+
+from .models import UserProfile
+
+
+logger = logging.getLogger(__name__)
+
+
+class Ranking:
+    """
+    Profiles ordered by xp (highest first, ties by profile id) in a sorted
+    list of ``(-xp, profile_id)`` keys. Rank lookups are a bisect, O(log n);
+    moving a profile is a bisect plus a list shift.
+    """
+
+    def __init__(self, rows=()):
+        self._xp = dict(rows)
+        self._keys = sorted((-xp, profile_id) for profile_id, xp in self._xp.items())
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, profile_id):
+        return profile_id in self._xp
+
+    def set(self, profile_id, xp):
+        previous = self._xp.get(profile_id)
+        if previous == xp:
+            return
+        if previous is not None:
+            del self._keys[bisect_left(self._keys, (-previous, profile_id))]
+        insort(self._keys, (-xp, profile_id))
+        self._xp[profile_id] = xp
+
+    def discard(self, profile_id):
+        previous = self._xp.pop(profile_id, None)
+        if previous is not None:
+            del self._keys[bisect_left(self._keys, (-previous, profile_id))]
+
+    def xp(self, profile_id):
+        return self._xp.get(profile_id)
+
+    def rank(self, profile_id):
+        """1-based rank, or None if the profile isn't ranked."""
+        xp = self._xp.get(profile_id)
+        if xp is None:
+            return None
+        return bisect_left(self._keys, (-xp, profile_id)) + 1
+
+    def entries(self, start, stop):
+        """[(rank, profile_id, xp)] for 0-based positions start..stop."""
+        start = max(start, 0)
+        return [
+            (position + 1, profile_id, -negative_xp)
+            for position, (negative_xp, profile_id) in enumerate(self._keys[start:stop], start)
+        ]
+
+
+def country_code(country):
+    """Normalise a Country object / raw column value to a code or None."""
+    return str(country or "") or None
+
+
+class Leaderboard:
+    """
+    Process-wide xp ranking of all profiles, plus one ranking per country.
+
+    Built from the database on first use (by one thread; concurrent first
+    lookups wait for it) and again every ``rebuild_interval`` seconds, which
+    also folds in writes made by other worker processes. Those rebuilds run
+    in a background thread while lookups keep using the current ranking;
+    changes applied to it meanwhile are carried over when the new one is
+    swapped in. In between it is updated incrementally: saves are applied
+    directly from the signal handlers, and profiles changed by queryset
+    updates are marked dirty and re-read in one query on the next lookup
+    (skipping any a save has applied since, as their rows may be older).
+    Changing country moves a profile between two partitions, which costs
+    two bisects.
+    """
+
+    def __init__(self, rebuild_interval):
+        self.rebuild_interval = rebuild_interval
+        self._ranking = None
+        self._countries = {}
+        self._profile_country = {}
+        self._built_at = None
+        self._dirty_users = set()
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._rebuilding = False
+        # token -> profile ids changed while that load (a rebuild, or a
+        # re-read of dirty profiles) is in flight.
+        self._watches = {}
+        self._rebuild_thread = None
+
+    def _load(self):
+        rows = UserProfile.objects.values_list('id', 'xp', 'country').iterator(chunk_size=10000)
+        everyone, partitions, profile_country = [], {}, {}
+        for profile_id, xp, country in rows:
+            everyone.append((profile_id, xp))
+            code = country_code(country)
+            if code:
+                partitions.setdefault(code, []).append((profile_id, xp))
+                profile_country[profile_id] = code
+        countries = {code: Ranking(members) for code, members in partitions.items()}
+        return Ranking(everyone), countries, profile_country
+
+    def _watch(self):
+        # Caller holds self._lock.
+        token = object()
+        self._watches[token] = set()
+        return token
+
+    def _touch(self, profile_id):
+        # Caller holds self._lock.
+        for touched in self._watches.values():
+            touched.add(profile_id)
+
+    def _apply(self, profile_id, xp, country):
+        # Caller holds self._lock.
+        self._touch(profile_id)
+        self._ranking.set(profile_id, xp)
+        code = country_code(country)
+        previous = self._profile_country.get(profile_id)
+        if previous and previous != code:
+            self._countries[previous].discard(profile_id)
+        if code:
+            self._countries.setdefault(code, Ranking()).set(profile_id, xp)
+            self._profile_country[profile_id] = code
+        else:
+            self._profile_country.pop(profile_id, None)
+
+    def _discard(self, profile_id):
+        # Caller holds self._lock.
+        self._touch(profile_id)
+        self._ranking.discard(profile_id)
+        previous = self._profile_country.pop(profile_id, None)
+        if previous:
+            self._countries[previous].discard(profile_id)
+
+    def _build(self):
+        with self._lock:
+            token = self._watch()
+        try:
+            ranking, countries, profile_country = self._load()
+        except Exception:
+            with self._lock:
+                del self._watches[token]
+            raise
+        with self._lock:
+            touched = self._watches.pop(token)
+            old_ranking, old_country = self._ranking, self._profile_country
+            self._ranking, self._countries, self._profile_country = ranking, countries, profile_country
+            self._built_at = time.monotonic()
+            # The load may predate these changes; the old ranking has them.
+            for profile_id in touched:
+                if old_ranking is not None and profile_id in old_ranking:
+                    self._apply(profile_id, old_ranking.xp(profile_id), old_country.get(profile_id))
+                else:
+                    self._discard(profile_id)
+
+    def _rebuild_in_background(self):
+        try:
+            self._build()
+        except Exception:
+            logger.exception("leaderboard_rebuild_failed")
+        finally:
+            with self._lock:
+                self._rebuilding = False
+            connection.close()
+
+    def _refresh(self):
+        if self._ranking is None:
+            with self._build_lock:
+                if self._ranking is None:
+                    self._build()
+        with self._lock:
+            stale = time.monotonic() - self._built_at >= self.rebuild_interval
+            start_rebuild = stale and not self._rebuilding
+            if start_rebuild:
+                self._rebuilding = True
+        if start_rebuild:
+            self._rebuild_thread = threading.Thread(
+                target=self._rebuild_in_background, name="leaderboard-rebuild", daemon=True
+            )
+            self._rebuild_thread.start()
+        with self._lock:
+            dirty, self._dirty_users = self._dirty_users, set()
+            if not dirty:
+                return
+            token = self._watch()
+        try:
+            rows = list(UserProfile.objects.filter(user_id__in=dirty).values_list('id', 'xp', 'country'))
+        except Exception:
+            with self._lock:
+                del self._watches[token]
+                self._dirty_users.update(dirty)
+            raise
+        with self._lock:
+            touched = self._watches.pop(token)
+            # A record() that landed after the SELECT carries the newer row.
+            for profile_id, xp, country in rows:
+                if profile_id not in touched:
+                    self._apply(profile_id, xp, country)
+
+    def record(self, profile_id, xp, country):
+        with self._lock:
+            if self._ranking is not None:
+                self._apply(profile_id, xp, country)
+
+    def discard(self, profile_id):
+        with self._lock:
+            if self._ranking is not None:
+                self._discard(profile_id)
+
+    def mark_dirty(self, user_ids):
+        with self._lock:
+            if self._ranking is not None:
+                self._dirty_users.update(user_ids)
+
+    def _partition(self, country):
+        # Caller holds self._lock.
+        if country is None:
+            return self._ranking
+        return self._countries.get(country_code(country)) or Ranking()
+
+    def top(self, limit, country=None):
+        self._refresh()
+        with self._lock:
+            return self._partition(country).entries(0, limit)
+
+    def around(self, profile_id, radius, country=None):
+        """(rank, entries) for a profile and ``radius`` neighbours each side."""
+        self._refresh()
+        with self._lock:
+            ranking = self._partition(country)
+            rank = ranking.rank(profile_id)
+            if rank is None:
+                return None, []
+            return rank, ranking.entries(rank - 1 - radius, rank + radius)
+
+
+leaderboard = Leaderboard(rebuild_interval=getattr(settings, "LEADERBOARD_REBUILD_SECONDS", 300))
+
+
+def with_usernames(entries):
+    """Turn (rank, profile_id, xp) tuples into API rows in one query."""
+    usernames = dict(
+        UserProfile.objects.filter(id__in=[profile_id for _, profile_id, _ in entries])
+        .values_list('id', 'user__username')
+    )
+    return [
+        {"rank": rank, "profile_id": profile_id, "username": usernames.get(profile_id), "xp": xp}
+        for rank, profile_id, xp in entries
+    ]
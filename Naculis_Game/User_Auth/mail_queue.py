@@ -0,0 +1,132 @@
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+
+logger = logging.getLogger(__name__)
+
+
+class MailQueue:
+    """
+    Outbound mail queue drained by a small pool of sender threads.
+
+    Each sender keeps one backend connection (``get_connection()``) open
+    while there is work, draining up to ``batch_size`` messages per wake-up
+    over it, and closes it after ``idle_timeout`` seconds without mail.
+    Failed messages are retried with exponential backoff and dropped (and
+    counted as failed) after ``max_retries`` retries.
+    """
+
+    def __init__(self, workers=2, batch_size=20, max_retries=3, backoff=2.0, idle_timeout=30.0):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+        self._metrics = {"enqueued": 0, "sent": 0, "retried": 0, "failed": 0}
+
+    def enqueue(self, message):
+        with self._lock:
+            self._start()
+            self._pending += 1
+            self._metrics["enqueued"] += 1
+        self._queue.put((message, 0))
+
+    def metrics(self):
+        with self._lock:
+            return dict(self._metrics, queued=self._pending)
+
+    def flush(self, timeout=None):
+        """Block until every enqueued message was sent or given up on."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def _start(self):
+        # Caller holds self._lock.
+        if self._threads:
+            return
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"mail-sender-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _finish(self, outcome):
+        with self._lock:
+            self._metrics[outcome] += 1
+            self._pending -= 1
+            if self._pending == 0:
+                self._idle.notify_all()
+
+    def _run(self):
+        connection = None
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.idle_timeout)]
+            except queue.Empty:
+                if connection is not None:
+                    connection.close()
+                    connection = None
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for message, attempt in batch:
+                try:
+                    if connection is None:
+                        connection = get_connection()
+                        connection.open()
+                    connection.send_messages([message])
+                except Exception:
+                    logger.exception("Sending mail to %s failed (attempt %d)", message.to, attempt + 1)
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+                    connection = None
+                    self._retry(message, attempt)
+                else:
+                    self._finish("sent")
+
+    def _retry(self, message, attempt):
+        if attempt >= self.max_retries:
+            self._finish("failed")
+            return
+        with self._lock:
+            self._metrics["retried"] += 1
+        timer = threading.Timer(
+            self.backoff * (2 ** attempt), self._queue.put, args=((message, attempt + 1),)
+        )
+        timer.daemon = True
+        timer.start()
+
+
+mail_queue = MailQueue(
+    workers=getattr(settings, "MAIL_QUEUE_WORKERS", 2),
+    batch_size=getattr(settings, "MAIL_QUEUE_BATCH_SIZE", 20),
+    max_retries=getattr(settings, "MAIL_QUEUE_MAX_RETRIES", 3),
+    backoff=getattr(settings, "MAIL_QUEUE_RETRY_BACKOFF", 2.0),
+)
+
+
+def enqueue_mail(subject, message, recipient_list, from_email=None):
+    """
+    Queue a plain-text email for background delivery. With
+    ``MAIL_QUEUE_ENABLED = False`` it is sent inline instead, which is what
+    tests using the locmem backend want.
+    """
+    email = EmailMessage(subject, message, from_email or settings.DEFAULT_FROM_EMAIL, recipient_list)
+    if not getattr(settings, "MAIL_QUEUE_ENABLED", True):
+        email.send()
+        return
+    mail_queue.enqueue(email)
@@ -0,0 +1,123 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from User_Auth.leaderboard import Leaderboard
+from User_Auth.models import CustomUser, UserProfile
+
+
+PREFIX = "bench-board-"
+CODE_PREFIX = "BB"
+COUNTRIES = ["NP", "IN", "US", "GB", "DE", "BR", "JP", "NG"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the in-memory leaderboard: seed --profiles users with random xp across a "
+        "few countries, time the cold build, then top, around and incremental record() "
+        "lookups on a private board. The synthetic rows are removed afterwards unless --keep "
+        "is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profiles", type=int, default=1_000_000)
+        parser.add_argument("--samples", type=int, default=2000, help="Lookups timed per operation.")
+        parser.add_argument("--keep", action="store_true", help="Leave the synthetic profiles in place.")
+
+    def handle(self, *args, **options):
+        if CustomUser.objects.filter(username__startswith=PREFIX).exists():
+            raise CommandError(f"Synthetic '{PREFIX}' users already exist; remove them first.")
+        n = options["profiles"]
+
+        started = time.perf_counter()
+        self.seed(n)
+        self.stdout.write(f"Seeded {n} profiles in {time.perf_counter() - started:.1f}s")
+        try:
+            self.measure(options["samples"])
+        finally:
+            if not options["keep"]:
+                self.cleanup()
+
+    def seed(self, n):
+        """Set-based inserts only: no model instances, no signals."""
+        users = connection.ops.quote_name(CustomUser._meta.db_table)
+        profiles = connection.ops.quote_name(UserProfile._meta.db_table)
+        now = timezone.now()
+        # One country in five is unset, like players who never chose one.
+        country = "CASE ABS(RANDOM()) %% 10 " + " ".join(
+            f"WHEN {i} THEN '{code}'" for i, code in enumerate(COUNTRIES)
+        ) + " ELSE NULL END"
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH RECURSIVE seq(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM seq WHERE i < %s)
+                INSERT INTO {users} (password, is_superuser, username, first_name, last_name,
+                                     email, is_staff, is_active, date_joined, role)
+                SELECT '!', %s, %s || i, '', '', %s || i || '@example.invalid', %s, %s, %s, 'user'
+                FROM seq
+                """,
+                [n - 1, False, PREFIX, PREFIX, False, True, now],
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {profiles} (user_id, gender, balance, xp, daily_streak, time_zone, level,
+                                        hearts, gem, discount_used, referral_count, date_joined,
+                                        referral_code, country)
+                SELECT id, 'N', 0, ABS(RANDOM()) %% 100000, 0, 'UTC', 0, 5, 0, %s, 0, %s,
+                       %s || SUBSTR(username, %s), {country}
+                FROM {users} WHERE username LIKE %s
+                """,
+                [False, now, CODE_PREFIX, len(PREFIX) + 1, PREFIX + "%"],
+            )
+
+    def measure(self, samples):
+        # A private board, so a running server's singleton is left alone.
+        board = Leaderboard(rebuild_interval=float("inf"))
+        started = time.perf_counter()
+        board._build()
+        self.stdout.write(f"Cold build ({len(board._ranking)} profiles) in {time.perf_counter() - started:.2f}s")
+
+        ids = list(board._profile_country)
+        picks = [random.choice(ids) for _ in range(samples)]
+        self.report("top(10)", [self.timed(board.top, 10) for _ in range(samples)])
+        self.report("top(100)", [self.timed(board.top, 100) for _ in range(samples)])
+        self.report("top(10, country)", [
+            self.timed(board.top, 10, random.choice(COUNTRIES)) for _ in range(samples)
+        ])
+        self.report("around(5)", [self.timed(board.around, pid, 5) for pid in picks])
+        self.report("around(5, country)", [
+            self.timed(board.around, pid, 5, board._profile_country[pid]) for pid in picks
+        ])
+        # What a post_save on_commit does: move the profile in both rankings.
+        self.report("record() same country", [
+            self.timed(board.record, pid, random.randrange(100000), board._profile_country[pid])
+            for pid in picks
+        ])
+        self.report("record() new country", [
+            self.timed(board.record, pid, random.randrange(100000), random.choice(COUNTRIES))
+            for pid in picks
+        ])
+
+    def timed(self, fn, *args):
+        started = time.perf_counter()
+        fn(*args)
+        return time.perf_counter() - started
+
+    def report(self, name, timings):
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f"{name:>24}: p50 {statistics.median(timings) * 1000:8.3f} ms  "
+            f"p99 {p99 * 1000:8.3f} ms  ({len(timings)} runs)"
+        )
+
+    def cleanup(self):
+        started = time.perf_counter()
+        # Raw deletes: the ORM would cascade and send signals row by row.
+        UserProfile.objects.filter(referral_code__startswith=CODE_PREFIX)._raw_delete(connection.alias)
+        CustomUser.objects.filter(username__startswith=PREFIX)._raw_delete(connection.alias)
+        self.stdout.write(f"Removed the synthetic profiles in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,90 @@
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import F
+
+from User_Auth import economy
+from User_Auth.models import CustomUser, LedgerEntry, UserProfile
+from User_Auth.registration import create_user_with_profile
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark gem rewards on one hot profile from concurrent threads: the ledger's "
+        "insert-only credit() against the old in-place UPDATE of UserProfile.gem."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--ops", type=int, default=200, help="Rewards per thread.")
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite":
+            self.stderr.write(
+                "SQLite serialises every writer on one database lock, so there is no row "
+                "contention to measure; run this against PostgreSQL."
+            )
+        user = create_user_with_profile(
+            username="bench-ledger", email="bench-ledger@example.invalid", password=None,
+        )
+        profile = user.userprofile
+        try:
+            def in_place():
+                # What every reward used to do: rewrite the profile row.
+                UserProfile.objects.filter(pk=profile.pk).update(gem=F("gem") + 1)
+
+            def ledger():
+                economy.credit(profile, gem=1, reason="bench")
+
+            for name, reward in (("in-place UPDATE", in_place), ("ledger INSERT", ledger)):
+                self.report(name, self.run(reward, options["threads"], options["ops"]), options)
+        finally:
+            LedgerEntry.objects.filter(user_profile=profile).delete()
+            CustomUser.objects.filter(pk=user.pk).delete()
+
+    def run(self, reward, threads, ops):
+        barrier = threading.Barrier(threads + 1)
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def worker():
+            mine = []
+            try:
+                barrier.wait()
+                for _ in range(ops):
+                    started = time.perf_counter()
+                    # A reward is one short transaction, as in the views.
+                    with transaction.atomic():
+                        reward()
+                    mine.append(time.perf_counter() - started)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+                with lock:
+                    latencies.extend(mine)
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in pool:
+            thread.join()
+        return time.perf_counter() - started, sorted(latencies), errors
+
+    def report(self, name, result, options):
+        elapsed, latencies, errors = result
+        if not latencies:
+            self.stderr.write(f"{name}: no reward completed ({errors[:1]!r})")
+            return
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f"{name:>16}: {len(latencies) / elapsed:8.0f} rewards/s  "
+            f"p50 {statistics.median(latencies) * 1000:6.2f} ms  p99 {p99 * 1000:6.2f} ms  "
+            f"({options['threads']} threads, {len(errors)} failed)"
+        )
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from User_Auth.hashing import get_executor
+from User_Auth.models import CustomUser
+
+
+USERNAME = "bench-login"
+EMAIL = "bench-login@example.invalid"
+PASSWORD = "bench-login-password"
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark logins/sec through the full request stack: the sync LoginView (hashing in "
+        "the request thread) against async_login_view (hashing in the process pool)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument(
+            "--concurrency", type=int, default=8,
+            help="Sync: request threads, like a threaded WSGI server. Async: concurrent requests on one event loop.",
+        )
+
+    def handle(self, *args, **options):
+        if CustomUser.objects.filter(email=EMAIL).exists():
+            raise CommandError(f"{EMAIL} already exists; remove it first.")
+        user = CustomUser(username=USERNAME, email=EMAIL)
+        user.set_password(PASSWORD)  # the configured hasher, as for real users
+        user.save()
+        self.body = json.dumps({"email": EMAIL, "username": USERNAME, "password": PASSWORD})
+        try:
+            # Spawn the hashing workers up front so their start-up isn't timed.
+            get_executor().submit(int).result()
+            total, concurrency = options["requests"], options["concurrency"]
+            self.report("sync  /api/login/", self.run_sync(total, concurrency), concurrency)
+            self.report("async /api/login/async/", asyncio.run(self.run_async(total, concurrency)), concurrency)
+        finally:
+            OutstandingToken.objects.filter(user=user).delete()
+            user.delete()
+
+    def run_sync(self, total, concurrency):
+        latencies, failures = [], []
+        lock = threading.Lock()
+        remaining = iter(range(total))
+
+        def worker():
+            client = Client(HTTP_HOST="localhost")
+            try:
+                while True:
+                    with lock:
+                        if next(remaining, None) is None:
+                            return
+                    started = time.perf_counter()
+                    response = client.post("/api/login/", self.body, content_type="application/json")
+                    with lock:
+                        latencies.append(time.perf_counter() - started)
+                        if response.status_code != 200:
+                            failures.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started, latencies, failures
+
+    async def run_async(self, total, concurrency):
+        latencies, failures = [], []
+        client = AsyncClient(HTTP_HOST="localhost")
+        gate = asyncio.Semaphore(concurrency)
+
+        async def login():
+            async with gate:
+                started = time.perf_counter()
+                response = await client.post("/api/login/async/", self.body, content_type="application/json")
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    failures.append(response.status_code)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(total)))
+        return time.perf_counter() - started, latencies, failures
+
+    def report(self, name, result, concurrency):
+        elapsed, latencies, failures = result
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f"{name:>24}: {len(latencies) / elapsed:7.1f} logins/s  "
+            f"p50 {statistics.median(latencies) * 1000:7.1f} ms  p99 {p99 * 1000:7.1f} ms  "
+            f"(concurrency {concurrency}, {len(failures)} failed)"
+        )
@@ -0,0 +1,90 @@
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from User_Auth.models import CustomUser, LedgerEntry, ProgressEvent
+from User_Auth.progress import ingest_events
+from User_Auth.registration import create_user_with_profile
+
+
+# The mix a lesson produces: mostly xp, some gems, the odd lost heart.
+MIX = [ProgressEvent.XP] * 8 + [ProgressEvent.GEM] + [ProgressEvent.HEART_LOST]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark ingest_events() throughput: each thread posts --batches batches of "
+        "--events progress events for its own profile, as the progress endpoint would."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=1, help="1 measures a single worker.")
+        parser.add_argument("--batches", type=int, default=200, help="Batches per thread.")
+        parser.add_argument("--events", type=int, default=50, help="Events per batch.")
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite" and options["threads"] > 1:
+            self.stderr.write("SQLite serialises writers; use --threads 1 or PostgreSQL.")
+        users = [
+            create_user_with_profile(
+                username=f"bench-progress-{i}", email=f"bench-progress-{i}@example.invalid", password=None,
+            )
+            for i in range(options["threads"])
+        ]
+        try:
+            self.report(self.run(users, options["batches"], options["events"]), options)
+        finally:
+            profiles = [user.userprofile for user in users]
+            ProgressEvent.objects.filter(user_profile__in=profiles).delete()
+            LedgerEntry.objects.filter(user_profile__in=profiles).delete()
+            CustomUser.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def run(self, users, batches, events):
+        barrier = threading.Barrier(len(users) + 1)
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def worker(profile):
+            mine = []
+            try:
+                barrier.wait()
+                for batch in range(batches):
+                    payload = [
+                        {"id": f"{batch}-{i}", "type": MIX[i % len(MIX)], "amount": 1}
+                        for i in range(events)
+                    ]
+                    started = time.perf_counter()
+                    ingest_events(profile, payload)
+                    mine.append(time.perf_counter() - started)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+                with lock:
+                    latencies.extend(mine)
+
+        pool = [threading.Thread(target=worker, args=(user.userprofile,)) for user in users]
+        for thread in pool:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in pool:
+            thread.join()
+        return time.perf_counter() - started, sorted(latencies), errors
+
+    def report(self, result, options):
+        elapsed, latencies, errors = result
+        if not latencies:
+            self.stderr.write(f"No batch completed ({errors[:1]!r})")
+            return
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f"{len(latencies) * options['events'] / elapsed:8.0f} events/s  "
+            f"{len(latencies) / elapsed:6.0f} batches/s  "
+            f"batch p50 {statistics.median(latencies) * 1000:6.2f} ms  p99 {p99 * 1000:6.2f} ms  "
+            f"({options['threads']} threads x {options['events']} events, {len(errors)} failed)"
+        )
@@ -0,0 +1,138 @@
+import random
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from User_Auth import referral_tree
+from User_Auth.models import CustomUser, ReferralClosure, UserProfile
+
+
+PREFIX = "bench-tree-"
+CODE_PREFIX = "BT"
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the referral closure table on a synthetic tree: seed --profiles users where "
+        "profile i is referred by profile i // --fanout, rebuild the closure table, then time "
+        "downline size, depth histogram, top referrers and a subtree move. The synthetic rows "
+        "are removed afterwards unless --keep is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profiles", type=int, default=1_000_000)
+        parser.add_argument("--fanout", type=int, default=4)
+        parser.add_argument("--samples", type=int, default=200, help="Profiles sampled per lookup.")
+        parser.add_argument("--keep", action="store_true", help="Leave the synthetic tree in place.")
+
+    def handle(self, *args, **options):
+        if CustomUser.objects.filter(username__startswith=PREFIX).exists():
+            raise CommandError(f"Synthetic '{PREFIX}' users already exist; remove them first.")
+        n, fanout = options["profiles"], options["fanout"]
+
+        started = time.perf_counter()
+        self.seed(n, fanout)
+        self.stdout.write(f"Seeded {n} profiles (fanout {fanout}) in {time.perf_counter() - started:.1f}s")
+        try:
+            started = time.perf_counter()
+            referral_tree.rebuild(UserProfile, ReferralClosure)
+            self.stdout.write(
+                f"Rebuilt closure table ({ReferralClosure.objects.count()} rows) "
+                f"in {time.perf_counter() - started:.1f}s"
+            )
+            self.measure(options["samples"])
+        finally:
+            if not options["keep"]:
+                self.cleanup()
+
+    def seed(self, n, fanout):
+        """Set-based inserts only: no model instances, no signals."""
+        users = connection.ops.quote_name(CustomUser._meta.db_table)
+        profiles = connection.ops.quote_name(UserProfile._meta.db_table)
+        now = timezone.now()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH RECURSIVE seq(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM seq WHERE i < %s)
+                INSERT INTO {users} (password, is_superuser, username, first_name, last_name,
+                                     email, is_staff, is_active, date_joined, role)
+                SELECT '!', %s, %s || i, '', '', %s || i || '@example.invalid', %s, %s, %s, 'user'
+                FROM seq
+                """,
+                [n - 1, False, PREFIX, PREFIX, False, True, now],
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {profiles} (user_id, gender, balance, xp, daily_streak, time_zone, level,
+                                        hearts, gem, discount_used, referral_count, date_joined,
+                                        referral_code)
+                SELECT id, 'N', 0, 0, 0, 'UTC', 0, 5, 0, %s, 0, %s,
+                       %s || SUBSTR(username, %s)
+                FROM {users} WHERE username LIKE %s
+                """,
+                [False, now, CODE_PREFIX, len(PREFIX) + 1, PREFIX + "%"],
+            )
+            cursor.execute(
+                f"""
+                UPDATE {profiles} SET referred_by_id = (
+                    SELECT parent.id FROM {profiles} parent
+                    WHERE parent.referral_code = %s || (CAST(SUBSTR({profiles}.referral_code, %s) AS INTEGER) / %s)
+                )
+                WHERE referral_code LIKE %s AND referral_code <> %s
+                """,
+                [CODE_PREFIX, len(CODE_PREFIX) + 1, fanout, CODE_PREFIX + "%", CODE_PREFIX + "0"],
+            )
+
+    def measure(self, samples):
+        ids = list(
+            UserProfile.objects.filter(referral_code__startswith=CODE_PREFIX)
+            .order_by("id").values_list("id", flat=True)
+        )
+        # Bias towards the top of the tree, where downlines are large.
+        picks = [ids[min(int(random.expovariate(1 / 50)), len(ids) - 1)] for _ in range(samples)]
+
+        self.report("downline_size", [self.timed(referral_tree.downline_size, pid) for pid in picks])
+        self.report("depth_histogram", [self.timed(referral_tree.depth_histogram, pid) for pid in picks])
+
+        def uncached_top():
+            cache.delete(referral_tree.TOP_REFERRERS_CACHE_KEY)
+            referral_tree.top_referrers(10)
+        self.report("top_referrers (cold)", [self.timed(uncached_top) for _ in range(5)])
+        self.report("top_referrers (cached)", [self.timed(referral_tree.top_referrers, 10) for _ in range(samples)])
+
+        # Moving a subtree: what re-parenting (or a referrer's deletion) costs.
+        def move(pid):
+            with transaction.atomic():
+                parent = UserProfile.objects.filter(pk=pid).values_list("referred_by_id", flat=True).get()
+                referral_tree.detach(pid)
+                referral_tree.attach(pid, parent)
+        movable = [pid for pid in random.sample(ids, min(samples, len(ids))) if pid != ids[0]]
+        self.report("detach + attach", [self.timed(move, pid) for pid in movable])
+
+    def timed(self, fn, *args):
+        started = time.perf_counter()
+        fn(*args)
+        return time.perf_counter() - started
+
+    def report(self, name, timings):
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(
+            f"{name:>24}: p50 {statistics.median(timings) * 1000:8.2f} ms  "
+            f"p99 {p99 * 1000:8.2f} ms  ({len(timings)} runs)"
+        )
+
+    def cleanup(self):
+        started = time.perf_counter()
+        bench = UserProfile.objects.filter(referral_code__startswith=CODE_PREFIX)
+        # Raw deletes: the ORM would cascade and send signals row by row.
+        ReferralClosure.objects.filter(descendant__in=bench)._raw_delete(connection.alias)
+        bench.update(referred_by=None)
+        bench._raw_delete(connection.alias)
+        CustomUser.objects.filter(username__startswith=PREFIX)._raw_delete(connection.alias)
+        cache.delete(referral_tree.TOP_REFERRERS_CACHE_KEY)
+        self.stdout.write(f"Removed the synthetic tree in {time.perf_counter() - started:.1f}s")
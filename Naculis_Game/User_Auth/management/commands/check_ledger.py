@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from User_Auth.economy import inconsistent_profiles
+
+
+class Command(BaseCommand):
+    help = "Check that every profile's balance and gem snapshot equals the sum of its folded ledger entries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        mismatches = 0
+        for profile_id, balance, gem, ledger_balance, ledger_gem in inconsistent_profiles(options["batch_size"]):
+            mismatches += 1
+            self.stdout.write(
+                f"Profile {profile_id}: snapshot {balance} balance / {gem} gems, "
+                f"ledger {ledger_balance} / {ledger_gem}"
+            )
+        if mismatches:
+            raise CommandError(f"{mismatches} profiles disagree with the ledger.")
+        self.stdout.write(self.style.SUCCESS("Every snapshot matches the ledger."))
@@ -0,0 +1,79 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from User_Auth.campaigns import CampaignRunning, campaign_size, claimable_runs, execute_run, queue_campaign
+
+
+class Command(BaseCommand):
+    help = (
+        "Grant one discount per matching profile for a campaign, or (with --pending) run the "
+        "campaigns queued through the API. Safe to re-run with the same campaign id."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("campaign_id", nargs="?")
+        parser.add_argument("--percent", type=Decimal)
+        parser.add_argument("--reason", default="")
+        parser.add_argument("--country", help="ISO country code, e.g. NP")
+        parser.add_argument("--min-level", type=int)
+        parser.add_argument("--max-level", type=int)
+        parser.add_argument("--expires-at", help="ISO 8601 date-time the discounts stop applying")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--pending", action="store_true", help="Run queued (and stalled) campaigns.")
+        parser.add_argument(
+            "--every", type=float, default=None,
+            help="With --pending, keep running as a worker, checking every N seconds.",
+        )
+
+    def handle(self, *args, **options):
+        if options["pending"]:
+            while True:
+                for run in claimable_runs():
+                    self.run_campaign(run, options)
+                if options["every"] is None:
+                    break
+                time.sleep(options["every"])
+            return
+
+        if not options["campaign_id"] or options["percent"] is None:
+            raise CommandError("Give a campaign id and --percent, or use --pending.")
+        expires_at = None
+        if options["expires_at"]:
+            expires_at = parse_datetime(options["expires_at"])
+            if expires_at is None:
+                raise CommandError("--expires-at must be an ISO 8601 date-time.")
+        try:
+            run = queue_campaign(
+                options["campaign_id"], options["percent"], options["reason"], country=options["country"],
+                min_level=options["min_level"], max_level=options["max_level"], expires_at=expires_at,
+            )
+        except CampaignRunning:
+            raise CommandError(f"{options['campaign_id']} is already running.")
+        self.run_campaign(run, options)
+
+    def run_campaign(self, run, options):
+        started = time.monotonic()
+
+        def progress(granted, last_id):
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"{run.campaign_id}: {granted} granted (up to profile {last_id}), {granted / elapsed:.0f}/s")
+
+        try:
+            claimed = execute_run(
+                run, batch_size=options["batch_size"],
+                progress=progress if options["verbosity"] > 1 else None,
+            )
+        except Exception as exc:
+            self.stderr.write(f"{run.campaign_id} failed: {exc!r}")
+            return
+        if not claimed:
+            self.stdout.write(f"{run.campaign_id} is being run by another worker.")
+            return
+        run.refresh_from_db()
+        self.stdout.write(self.style.SUCCESS(
+            f"{run.campaign_id}: {run.status}, {campaign_size(run.campaign_id)} discounts granted "
+            f"({time.monotonic() - started:.2f}s)."
+        ))
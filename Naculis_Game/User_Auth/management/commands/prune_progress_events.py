@@ -0,0 +1,55 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from User_Auth.models import ProgressEvent
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Delete ProgressEvent rows older than the retention window in bounded chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--days", type=int, default=None,
+            help="Retention in days (default: settings.PROGRESS_EVENT_RETENTION_DAYS).",
+        )
+
+    def handle(self, *args, **options):
+        days = options["days"]
+        if days is None:
+            days = getattr(settings, "PROGRESS_EVENT_RETENTION_DAYS", 30)
+        self.prune(timezone.now() - timedelta(days=days), options["batch_size"])
+
+    def prune(self, cutoff, batch_size):
+        started = time.monotonic()
+        pruned = batches = 0
+
+        while True:
+            # Walks the created_at index; each DELETE touches at most batch_size rows.
+            ids = list(
+                ProgressEvent.objects
+                .filter(created_at__lt=cutoff)
+                .order_by("created_at")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            deleted, _ = ProgressEvent.objects.filter(id__in=ids).delete()
+            pruned += deleted
+            batches += 1
+
+        elapsed = time.monotonic() - started
+        logger.info(
+            "progress_events_pruned rows=%d batches=%d seconds=%.3f",
+            pruned, batches, elapsed,
+        )
+        self.stdout.write(f"Pruned {pruned} progress events older than {cutoff:%Y-%m-%d %H:%M} in {batches} batches ({elapsed:.2f}s).")
+        return pruned
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = "Delete expired outstanding and blacklisted JWTs in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--sleep", type=float, default=0.0,
+            help="Seconds to pause between batches to let other writers through.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        now = timezone.now()
+        last_id = 0
+        outstanding_deleted = blacklisted_deleted = 0
+
+        while True:
+            # Walk the primary key so every batch is a short range scan.
+            ids = list(
+                OutstandingToken.objects
+                .filter(id__gt=last_id, expires_at__lte=now)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+
+            with transaction.atomic():
+                deleted, _ = BlacklistedToken.objects.filter(token_id__in=ids).delete()
+                blacklisted_deleted += deleted
+                deleted, _ = OutstandingToken.objects.filter(id__in=ids).delete()
+                outstanding_deleted += deleted
+
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {outstanding_deleted} outstanding and {blacklisted_deleted} blacklisted tokens."
+        ))
@@ -0,0 +1,56 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from User_Auth.models import PendingRegistration
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Delete expired PendingRegistration rows in bounded chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--every", type=float, default=None,
+            help="Keep running as a sweeper, purging every N seconds.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            self.purge(options["batch_size"])
+            if options["every"] is None:
+                break
+            time.sleep(options["every"])
+
+    def purge(self, batch_size):
+        started = time.monotonic()
+        now = timezone.now()
+        purged = batches = 0
+
+        while True:
+            # Uses the expires_at index; each DELETE touches at most batch_size rows.
+            ids = list(
+                PendingRegistration.objects
+                .filter(expires_at__lte=now)
+                .order_by("expires_at")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            # Re-check expiry: a resend may have extended one of these since the SELECT.
+            deleted, _ = PendingRegistration.objects.filter(id__in=ids, expires_at__lte=now).delete()
+            purged += deleted
+            batches += 1
+
+        elapsed = time.monotonic() - started
+        logger.info(
+            "pending_registrations_purged rows=%d batches=%d seconds=%.3f",
+            purged, batches, elapsed,
+        )
+        self.stdout.write(f"Purged {purged} expired pending registrations in {batches} batches ({elapsed:.2f}s).")
+        return purged
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from User_Auth import referral_tree
+from User_Auth.models import ReferralClosure, UserProfile
+
+
+class Command(BaseCommand):
+    help = "Recompute the referral closure table from UserProfile.referred_by."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            referral_tree.rebuild(UserProfile, ReferralClosure)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt referral tree: {ReferralClosure.objects.count()} ancestor/descendant links."
+        ))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from User_Auth.levels import level_expression
+from User_Auth.models import UserProfile
+from User_Auth.signals import notify_profiles_updated
+
+
+class Command(BaseCommand):
+    help = "Re-derive UserProfile.level from xp with the current level curve."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--dry-run", action="store_true", help="Count stale levels without writing.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        target = level_expression()
+        last_id = 0
+        scanned = changed = 0
+
+        while True:
+            rows = list(
+                UserProfile.objects.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", "user_id")[:batch_size]
+            )
+            if not rows:
+                break
+            first_id, last_id = rows[0][0], rows[-1][0]
+            scanned += len(rows)
+
+            # One CASE UPDATE per id range, touching only rows whose level is off.
+            stale = UserProfile.objects.filter(id__gte=first_id, id__lte=last_id).alias(
+                target=target
+            ).exclude(level=target)
+            if options["dry_run"]:
+                changed += stale.count()
+                continue
+            with transaction.atomic():
+                updated = stale.update(level=target)
+                if updated:
+                    notify_profiles_updated(user_id for _, user_id in rows)
+            changed += updated
+
+        verb = "Would update" if options["dry_run"] else "Updated"
+        self.stdout.write(self.style.SUCCESS(f"Scanned {scanned} profiles. {verb} {changed} levels."))
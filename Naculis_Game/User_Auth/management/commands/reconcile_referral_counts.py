@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from User_Auth.models import UserProfile
+from User_Auth.signals import notify_profiles_updated
+
+
+class Command(BaseCommand):
+    help = "Recompute UserProfile.referral_count from referred_by and correct drifted rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--dry-run", action="store_true", help="Report drift without writing.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_id = 0
+        scanned = drifted = 0
+
+        while True:
+            rows = list(
+                UserProfile.objects.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", "user_id", "referral_count")[:batch_size]
+            )
+            if not rows:
+                break
+            first_id, last_id = rows[0][0], rows[-1][0]
+
+            # One grouped aggregate per id range, served by the referred_by index.
+            actual = dict(
+                UserProfile.objects
+                .filter(referred_by_id__gte=first_id, referred_by_id__lte=last_id)
+                .values("referred_by_id")
+                .annotate(count=Count("id"))
+                .values_list("referred_by_id", "count")
+            )
+            fixes = {
+                profile_id: user_id
+                for profile_id, user_id, referral_count in rows
+                if referral_count != actual.get(profile_id, 0)
+            }
+            scanned += len(rows)
+            drifted += len(fixes)
+
+            if fixes and not options["dry_run"]:
+                # The count is taken again inside the UPDATE rather than written
+                # from the values read above, so a sign-up that bumped a counter
+                # in between isn't overwritten with a stale total.
+                referrals = (
+                    UserProfile.objects.filter(referred_by=OuterRef("pk"))
+                    .order_by()
+                    .values("referred_by")
+                    .annotate(count=Count("id"))
+                    .values("count")
+                )
+                with transaction.atomic():
+                    UserProfile.objects.filter(id__in=fixes).update(
+                        referral_count=Coalesce(Subquery(referrals), 0),
+                    )
+                    notify_profiles_updated(fixes.values())
+
+        verb = "Would correct" if options["dry_run"] else "Corrected"
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {scanned} profiles. {verb} {drifted} drifted referral counts."
+        ))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from User_Auth.streaks import rollover_streaks
+
+
+class Command(BaseCommand):
+    help = "Reset lapsed daily streaks in chunks, one time-zone bucket at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def progress(time_zone, reset):
+            self.stdout.write(f"{time_zone}: {reset} streaks reset so far")
+
+        reset = rollover_streaks(options["batch_size"], progress=progress if options["verbosity"] > 1 else None)
+        self.stdout.write(self.style.SUCCESS(
+            f"Reset {reset} lapsed streaks in {time.monotonic() - started:.2f}s."
+        ))
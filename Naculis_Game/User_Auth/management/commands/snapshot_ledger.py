@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from User_Auth.economy import fold
+
+
+class Command(BaseCommand):
+    help = "Fold unfolded ledger entries into the cached UserProfile balance and gem snapshots."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        folded = fold(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Folded {folded} ledger entries in {time.monotonic() - started:.2f}s."
+        ))
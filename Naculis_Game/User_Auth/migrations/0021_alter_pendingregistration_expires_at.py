@@ -0,0 +1,18 @@
+# Generated by Django 4.2.14 on 2026-10-18 07:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('User_Auth', '0020_pendingregistration_raw_password'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pendingregistration',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,89 @@
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.db import migrations
+
+
+BATCH_SIZE = 2000
+
+# Frozen copy of User_Auth.referral_codes as of this migration, so later
+# changes to that module can't change what this migration writes.
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+CODE_LENGTH = 8
+HALF_BITS = 20
+HALF_MASK = (1 << HALF_BITS) - 1
+ROUNDS = 4
+
+
+def encode_referral_code(number):
+    key = settings.REFERRAL_CODE_KEY.encode()
+    left, right = number >> HALF_BITS, number & HALF_MASK
+    for round_no in range(ROUNDS):
+        digest = hmac.new(key, f"{round_no}:{right}".encode(), hashlib.sha256).digest()
+        left, right = right, left ^ (int.from_bytes(digest[:4], "big") & HALF_MASK)
+    value = (left << HALF_BITS) | right
+    chars = []
+    for _ in range(CODE_LENGTH):
+        value, index = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[index])
+    return "".join(reversed(chars))
+
+
+def referral_link_for(code):
+    return f"http://127.0.0.1:8000/api/register/?ref={code}"
+
+
+def reissue_referral_codes(apps, schema_editor):
+    """Replace uuid-prefix referral codes with permutation-based ones in bulk."""
+    UserProfile = apps.get_model('User_Auth', 'UserProfile')
+    PendingRegistration = apps.get_model('User_Auth', 'PendingRegistration')
+
+    # Sign-ups that are mid-verification still carry an old code.
+    pending_codes = set(
+        PendingRegistration.objects.exclude(referral_code__isnull=True)
+        .exclude(referral_code='')
+        .values_list('referral_code', flat=True)
+    )
+    renamed = {
+        old_code: encode_referral_code(user_id)
+        for old_code, user_id in UserProfile.objects.filter(referral_code__in=pending_codes)
+        .values_list('referral_code', 'user_id')
+    }
+
+    # Old and new codes share the unique column; clear it first so a batch
+    # can't trip over a row that hasn't been rewritten yet.
+    UserProfile.objects.update(referral_code=None)
+
+    last_id = 0
+    while True:
+        rows = list(
+            UserProfile.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', 'user_id')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        profiles = []
+        for profile_id, user_id in rows:
+            code = encode_referral_code(user_id)
+            profiles.append(UserProfile(id=profile_id, referral_code=code, referral_link=referral_link_for(code)))
+        UserProfile.objects.bulk_update(profiles, ['referral_code', 'referral_link'])
+
+    for old_code, code in renamed.items():
+        PendingRegistration.objects.filter(referral_code=old_code).update(
+            referral_code=code, referral_link=referral_link_for(code)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('User_Auth', '0021_alter_pendingregistration_expires_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(reissue_referral_codes, migrations.RunPython.noop),
+    ]
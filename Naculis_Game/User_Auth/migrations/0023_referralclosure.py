@@ -0,0 +1,63 @@
+# Generated by Django 4.2.14 on 2026-10-18 07:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_referral_closure(apps, schema_editor):
+    """
+    Fill the closure table from referred_by one tree level at a time (a
+    frozen copy of User_Auth.referral_tree.rebuild as of this migration).
+    """
+    UserProfile = apps.get_model('User_Auth', 'UserProfile')
+    ReferralClosure = apps.get_model('User_Auth', 'ReferralClosure')
+    quote = schema_editor.connection.ops.quote_name
+    closure_table = quote(ReferralClosure._meta.db_table)
+    profile_table = quote(UserProfile._meta.db_table)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {closure_table} (ancestor_id, descendant_id, depth)
+            SELECT referred_by_id, id, 1 FROM {profile_table} WHERE referred_by_id IS NOT NULL
+            """
+        )
+        depth = 1
+        while cursor.rowcount:
+            cursor.execute(
+                f"""
+                INSERT INTO {closure_table} (ancestor_id, descendant_id, depth)
+                SELECT c.ancestor_id, p.id, c.depth + 1
+                FROM {profile_table} p
+                JOIN {closure_table} c ON c.descendant_id = p.referred_by_id
+                WHERE c.depth = %s
+                """,
+                [depth],
+            )
+            depth += 1
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('User_Auth', '0022_reissue_referral_codes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferralClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='downline_links', to='User_Auth.userprofile')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upline_links', to='User_Auth.userprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ancestor', 'depth'], name='referral_ancestor_depth_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='referralclosure',
+            constraint=models.UniqueConstraint(fields=('ancestor', 'descendant'), name='unique_referral_path'),
+        ),
+        migrations.RunPython(build_referral_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.14 on 2026-10-18 07:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('User_Auth', '0023_referralclosure'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userprofile',
+            name='xp',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+    ]
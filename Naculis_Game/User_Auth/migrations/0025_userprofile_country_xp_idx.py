@@ -0,0 +1,17 @@
+# Generated by Django 4.2.14 on 2026-10-18 07:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('User_Auth', '0024_alter_userprofile_xp'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['country', '-xp'], name='profile_country_xp_idx'),
+        ),
+    ]
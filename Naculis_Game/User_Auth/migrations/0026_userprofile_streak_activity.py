@@ -0,0 +1,36 @@
+# Generated by Django 4.2.14 on 2026-10-18 07:22
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def start_live_streaks_today(apps, schema_editor):
+    # Existing streaks have no recorded activity; give them today so the first
+    # rollover doesn't reset every one of them.
+    UserProfile = apps.get_model('User_Auth', 'UserProfile')
+    UserProfile.objects.filter(daily_streak__gt=0).update(last_activity_date=timezone.now().date())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('User_Auth', '0025_userprofile_country_xp_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='last_activity_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='time_zone',
+            field=models.CharField(default='UTC', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(condition=models.Q(('daily_streak__gt', 0)), fields=['time_zone', 'last_activity_date'], name='profile_streak_rollover_idx'),
+        ),
+        migrations.RunPython(start_live_streaks_today, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.14 on 2026-10-18 07:23
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def start_regen_clocks(apps, schema_editor):
+    # Profiles already below max start regenerating from now.
+    UserProfile = apps.get_model('User_Auth', 'UserProfile')
+    UserProfile.objects.filter(hearts__lt=getattr(settings, 'HEARTS_MAX', 5)).update(
+        hearts_refilled_at=timezone.now()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('User_Auth', '0026_userprofile_streak_activity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='hearts_refilled_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(start_regen_clocks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.14 on 2026-10-18 07:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('User_Auth', '0027_userprofile_hearts_refilled_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgressEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_event_id', models.CharField(max_length=64)),
+                ('kind', models.CharField(choices=[('xp', 'XP gained'), ('heart_lost', 'Heart lost'), ('gem', 'Gem earned')], max_length=16)),
+                ('amount', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('user_profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress_events', to='User_Auth.userprofile')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='progressevent',
+            constraint=models.UniqueConstraint(fields=('user_profile', 'client_event_id'), name='unique_client_event'),
+        ),
+    ]
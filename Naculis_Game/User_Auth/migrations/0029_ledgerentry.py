@@ -0,0 +1,52 @@
+# Generated by Django 4.2.14 on 2026-10-18 07:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def open_ledgers(apps, schema_editor):
+    # One folded opening entry per profile holding its current balance and
+    # gems, so every snapshot starts out equal to its folded entries.
+    UserProfile = apps.get_model('User_Auth', 'UserProfile')
+    LedgerEntry = apps.get_model('User_Auth', 'LedgerEntry')
+    profiles = (
+        UserProfile.objects.exclude(balance=0, gem=0)
+        .values_list('id', 'balance', 'gem')
+        .iterator(chunk_size=5000)
+    )
+    batch = []
+    for profile_id, balance, gem in profiles:
+        batch.append(LedgerEntry(
+            user_profile_id=profile_id, balance_delta=balance, gem_delta=gem,
+            reason='Opening balance', folded=True,
+        ))
+        if len(batch) == 5000:
+            LedgerEntry.objects.bulk_create(batch)
+            batch = []
+    LedgerEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('User_Auth', '0028_progressevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance_delta', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('gem_delta', models.IntegerField(default=0)),
+                ('reason', models.CharField(blank=True, max_length=64)),
+                ('folded', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user_profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='User_Auth.userprofile')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('folded', False)), fields=['user_profile'], name='ledger_unfolded_idx')],
+            },
+        ),
+        migrations.RunPython(open_ledgers, migrations.RunPython.noop),
+    ]
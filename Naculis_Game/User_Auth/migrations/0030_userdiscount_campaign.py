@@ -0,0 +1,22 @@
+# Generated by Django 4.2.14 on 2026-10-18 07:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('User_Auth', '0029_ledgerentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userdiscount',
+            name='campaign_id',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='userdiscount',
+            constraint=models.UniqueConstraint(fields=('campaign_id', 'user_profile'), name='unique_campaign_discount'),
+        ),
+    ]
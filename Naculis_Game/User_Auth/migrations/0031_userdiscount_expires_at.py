@@ -0,0 +1,22 @@
+# Generated by Django 4.2.14 on 2026-10-18 07:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('User_Auth', '0030_userdiscount_campaign'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userdiscount',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='userdiscount',
+            index=models.Index(condition=models.Q(('used', False)), fields=['user_profile', '-percent'], name='discount_unused_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.14 on 2026-10-18 07:46
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+import django.db.models.functions.text
+
+
+def refuse_case_duplicates(apps, schema_editor):
+    """
+    Stop, naming the accounts, if any emails or usernames differ only in
+    case: the constraints below would fail on them with a bare
+    IntegrityError. Which account to keep is left to a person; merge or
+    rename them and migrate again.
+    """
+    CustomUser = apps.get_model('User_Auth', 'CustomUser')
+    problems = []
+    for field in ('email', 'username'):
+        duplicated = (
+            CustomUser.objects.annotate(folded=Lower(field))
+            .values('folded').annotate(n=Count('id')).filter(n__gt=1)
+            .values_list('folded', flat=True)
+        )
+        clashes = (
+            CustomUser.objects.annotate(folded=Lower(field))
+            .filter(folded__in=duplicated)
+            .order_by('folded', 'id')
+            .values_list('id', field)
+        )
+        problems.extend(f"  {field} {value!r} (user id {user_id})" for user_id, value in clashes)
+    if problems:
+        raise RuntimeError(
+            "Cannot add the case-insensitive unique constraints on email and username; "
+            "these accounts differ only in case:\n" + "\n".join(problems)
+            + "\nMerge or rename them, then run migrate again."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('User_Auth', '0031_userdiscount_expires_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(refuse_case_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='unique_user_email_ci'),
+        ),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('username'), name='unique_user_username_ci'),
+        ),
+    ]
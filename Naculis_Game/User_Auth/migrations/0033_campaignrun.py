@@ -0,0 +1,33 @@
+# Generated by Django 4.2.14 on 2026-10-18 08:01
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('User_Auth', '0032_customuser_case_insensitive_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampaignRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('campaign_id', models.SlugField(max_length=64, unique=True)),
+                ('percent', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('reason', models.CharField(blank=True, max_length=64)),
+                ('country', models.CharField(blank=True, max_length=2)),
+                ('min_level', models.PositiveIntegerField(blank=True, null=True)),
+                ('max_level', models.PositiveIntegerField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=16)),
+                ('last_id', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
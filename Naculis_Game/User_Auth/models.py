@@ -1,10 +1,66 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Lower
+from django.core.exceptions import ValidationError
 from django_countries.fields import CountryField
-import uuid
 from cloudinary.models import CloudinaryField
 from django.utils import timezone
-class CustomUser(AbstractUser):
+from .referral_codes import encode_referral_code, referral_link_for
+from .levels import level_for_xp
+
+
+class DirtyFieldsMixin:
+    """
+    Remembers the column values an instance was loaded with so that a plain
+    save() writes only the columns that changed, and is skipped entirely when
+    nothing did. Explicit update_fields and inserts are left untouched.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_fields()
+        return instance
+
+    def _remember_fields(self, attnames=None):
+        loaded = getattr(self, '_loaded_values', {}) if attnames is not None else {}
+        for field in self._meta.concrete_fields:
+            if field.attname in self.__dict__ and (attnames is None or field.attname in attnames):
+                loaded[field.attname] = getattr(self, field.attname)
+        self._loaded_values = loaded
+
+    def get_dirty_fields(self):
+        """Names of loaded fields whose value differs from the database copy."""
+        loaded = getattr(self, '_loaded_values', {})
+        return [
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key
+            and field.attname in self.__dict__
+            and (field.attname not in loaded or loaded[field.attname] != getattr(self, field.attname))
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not args and kwargs.get('update_fields') is None \
+                and not kwargs.get('force_insert'):
+            dirty = self.get_dirty_fields()
+            if not dirty:
+                return
+            kwargs['update_fields'] = dirty
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        self._remember_fields(
+            None if update_fields is None
+            else {self._meta.get_field(name).attname for name in update_fields}
+        )
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        self._remember_fields(
+            None if fields is None else {self._meta.get_field(name).attname for name in fields}
+        )
+
+
+class CustomUser(DirtyFieldsMixin, AbstractUser):
     ROLE_CHOICES = [
         ('admin', 'Admin'),
         ('staff', 'Staff'),
@@ -18,13 +74,20 @@ class CustomUser(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            # Registration relies on these: "Alice" and "alice" are the same account.
+            models.UniqueConstraint(Lower('email'), name='unique_user_email_ci'),
+            models.UniqueConstraint(Lower('username'), name='unique_user_username_ci'),
+        ]
+
     def __str__(self):
         return self.email
 
 
 # models.py
 
-class UserProfile(models.Model):
+class UserProfile(DirtyFieldsMixin, models.Model):
     GENDER_CHOICES = [
         ("M", "Male"),
         ("F", "Female"),
@@ -42,10 +105,13 @@ class UserProfile(models.Model):
     profile_picture = CloudinaryField('image', blank=True, null=True)
     previous_profile_picture = CloudinaryField('image', blank=True, null=True)
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
-    xp = models.IntegerField(default=0)
+    xp = models.IntegerField(default=0, db_index=True)
     daily_streak = models.IntegerField(default=0)
+    last_activity_date = models.DateField(null=True, blank=True)  # in the user's time_zone
+    time_zone = models.CharField(max_length=64, default='UTC')
     level = models.IntegerField(default=0)
     hearts = models.IntegerField(default=5)
+    hearts_refilled_at = models.DateTimeField(null=True, blank=True)  # regen clock; None while full
     gem = models.IntegerField(default=0)
     phone = models.CharField(max_length=15, blank=True, null=True)
     referral_code = models.CharField(max_length=20, unique=True, blank=True, null=True)
@@ -55,9 +121,30 @@ class UserProfile(models.Model):
     referral_count = models.IntegerField(default=0)
     date_joined = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['country', '-xp'], name='profile_country_xp_idx'),
+            # Only live streaks are indexed; that's all the nightly rollover looks at.
+            models.Index(
+                fields=['time_zone', 'last_activity_date'],
+                condition=models.Q(daily_streak__gt=0),
+                name='profile_streak_rollover_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.user.username + "'s Profile"
 
+    def clean(self):
+        from .referral_tree import is_in_downline
+        if self.pk and self.referred_by_id and is_in_downline(self.pk, self.referred_by_id):
+            raise ValidationError({'referred_by': "A profile can't be referred by itself or its own referrals."})
+
+    def current_hearts(self, now=None):
+        """Stored hearts plus the ones regenerated since hearts_refilled_at."""
+        from .hearts import regenerate
+        return regenerate(self.hearts, self.hearts_refilled_at, now)[0]
+
     def is_fully_filled(self):
         for field in self._meta.fields:
             if getattr(self, field.name) in [None, ''] and field.name not in ['id', 'profile_picture', 'dob']:
@@ -65,14 +152,14 @@ class UserProfile(models.Model):
         return True
     
     def generate_referral_code(self):
-        """Generate a unique referral code for the user."""
-        return str(uuid.uuid4())[:8]  # First 8 characters of UUID
+        """Generate the user's referral code; unique by construction (see referral_codes)."""
+        return encode_referral_code(self.user_id)
 
 
 
     def generate_referral_link(self):
         """Generate a referral link using the referral code."""
-        return f"http://127.0.0.1:8000/api/register/?ref={self.referral_code}"
+        return referral_link_for(self.referral_code)
     
 
       # Link will use the referral code
@@ -84,10 +171,38 @@ class UserProfile(models.Model):
 
         if not self.referral_link:
             self.referral_link = self.generate_referral_link() 
+
+        # Level always follows xp along the server's curve.
+        self.level = level_for_xp(self.xp)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'xp' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'level'}
         
         super().save(*args, **kwargs)  
 
 
+class ReferralClosure(models.Model):
+    """
+    Closure table of the referral tree: one row for every (ancestor,
+    descendant) pair, ``depth`` levels apart. Maintained by
+    ``referral_tree`` from the UserProfile signals.
+    """
+    ancestor = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='downline_links')
+    descendant = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='upline_links')
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='unique_referral_path'),
+        ]
+        indexes = [
+            models.Index(fields=['ancestor', 'depth'], name='referral_ancestor_depth_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
+
 class UserDiscount(models.Model):
     user_profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='discounts')
     percent = models.DecimalField(max_digits=5, decimal_places=2)  # e.g., 50.00 for 50%
@@ -95,18 +210,125 @@ class UserDiscount(models.Model):
     used = models.BooleanField(default=False)
     granted_at = models.DateTimeField(auto_now_add=True)
     used_at = models.DateTimeField(blank=True, null=True)
+    expires_at = models.DateTimeField(blank=True, null=True)  # None: never expires
+    campaign_id = models.CharField(max_length=64, blank=True, null=True)  # set for bulk campaign grants
+
+    class Meta:
+        constraints = [
+            # Makes campaign grants idempotent; NULLs (one-off discounts) never clash.
+            models.UniqueConstraint(fields=['campaign_id', 'user_profile'], name='unique_campaign_discount'),
+        ]
+        indexes = [
+            # Checkout only ever looks at a user's unused discounts, best first.
+            models.Index(
+                fields=['user_profile', '-percent'],
+                condition=models.Q(used=False),
+                name='discount_unused_idx',
+            ),
+        ]
+
+    def is_expired(self):
+        return self.expires_at is not None and timezone.now() >= self.expires_at
 
     def __str__(self):
         return f"{self.user_profile.user.username}: {self.percent}% ({'used' if self.used else 'unused'})"
     
 
+class CampaignRun(models.Model):
+    """
+    A queued or running bulk campaign grant (see campaigns.py). The API only
+    records the run; ``manage.py grant_campaign --pending`` executes it,
+    refreshing ``updated_at`` and ``last_id`` after every chunk so a run
+    whose worker died is picked up again from where it stopped.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    campaign_id = models.SlugField(max_length=64, unique=True)
+    percent = models.DecimalField(max_digits=5, decimal_places=2)
+    reason = models.CharField(max_length=64, blank=True)
+    country = models.CharField(max_length=2, blank=True)
+    min_level = models.PositiveIntegerField(blank=True, null=True)
+    max_level = models.PositiveIntegerField(blank=True, null=True)
+    expires_at = models.DateTimeField(blank=True, null=True)  # of the granted discounts
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    last_id = models.PositiveIntegerField(default=0)  # targets up to this profile id are done
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(default=timezone.now)  # heartbeat while running
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.campaign_id}: {self.status}"
+
+
+class LedgerEntry(models.Model):
+    """
+    Append-only record of a balance and/or gem change. UserProfile.balance
+    and UserProfile.gem are snapshots holding the sum of a profile's
+    folded entries; the live amounts add the unfolded tail (see economy).
+    """
+    user_profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='ledger_entries')
+    balance_delta = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    gem_delta = models.IntegerField(default=0)
+    reason = models.CharField(max_length=64, blank=True)
+    folded = models.BooleanField(default=False)  # already included in the profile snapshot
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # The unfolded tail is all that balance reads and snapshotting scan.
+            models.Index(fields=['user_profile'], condition=models.Q(folded=False), name='ledger_unfolded_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_profile_id}: {self.balance_delta:+} balance, {self.gem_delta:+} gems ({self.reason})"
+
+
+class ProgressEvent(models.Model):
+    """
+    A progress event already applied to a profile, kept so a client
+    resending a batch (retries, several devices) can't apply it twice.
+    Rows older than PROGRESS_EVENT_RETENTION_DAYS are removed by
+    ``manage.py prune_progress_events``; replays must arrive within it.
+    """
+    XP = 'xp'
+    HEART_LOST = 'heart_lost'
+    GEM = 'gem'
+    KIND_CHOICES = [
+        (XP, 'XP gained'),
+        (HEART_LOST, 'Heart lost'),
+        (GEM, 'Gem earned'),
+    ]
+    user_profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='progress_events')
+    client_event_id = models.CharField(max_length=64)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    amount = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user_profile', 'client_event_id'], name='unique_client_event'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_profile_id}: {self.kind} +{self.amount} ({self.client_event_id})"
+
+
 class PendingRegistration(models.Model):
     email = models.EmailField(unique=True)
     username = models.CharField(max_length=150)
     raw_password = models.CharField(max_length=128, blank=True, null=True)  # ✅ Add this
     password = models.CharField(max_length=128)
     otp = models.CharField(max_length=6)
-    expires_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
     referral_code = models.CharField(max_length=20, blank=True, null=True)
     referral_link = models.URLField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
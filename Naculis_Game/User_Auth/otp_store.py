@@ -0,0 +1,212 @@
+import hashlib
+import hmac
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+
+# verify() results
+OTP_OK = "ok"
+OTP_MISSING = "missing"
+OTP_EXPIRED = "expired"
+OTP_INVALID = "invalid"
+OTP_LOCKED = "locked"
+
+
+def hash_otp(email, otp):
+    """Keyed hash of an OTP; the plain code is never stored."""
+    message = f"{email.lower()}:{otp}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+class OTPStore:
+    """
+    Storage for one-time passwords keyed by email. Each email holds at most
+    one live OTP; issuing a new one replaces the old code and resets its
+    attempt counter. A correctly verified OTP can leave a "verified" marker
+    for the email, good for one use within the same TTL (password reset).
+    """
+
+    def __init__(self, ttl, max_attempts):
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+
+    def issue(self, email, otp):
+        raise NotImplementedError
+
+    def verify(self, email, otp):
+        """Return one of the OTP_* results; a correct OTP is consumed."""
+        raise NotImplementedError
+
+    def discard(self, email):
+        raise NotImplementedError
+
+    def mark_verified(self, email):
+        raise NotImplementedError
+
+    def consume_verified(self, email):
+        """Return True and drop the marker if the email was verified and it hasn't expired."""
+        raise NotImplementedError
+
+
+class CacheOTPStore(OTPStore):
+    """
+    OTPs kept in a Django cache, so every worker sharing that cache (Redis,
+    Memcached, database) sees the same codes. Expiry is the cache timeout.
+    """
+
+    def __init__(self, ttl, max_attempts, alias="default"):
+        super().__init__(ttl, max_attempts)
+        self.cache = caches[alias]
+
+    def _keys(self, email):
+        digest = hashlib.sha256(email.lower().encode()).hexdigest()
+        return f"otp:{digest}", f"otp-attempts:{digest}"
+
+    def _verified_key(self, email):
+        return f"otp-verified:{hashlib.sha256(email.lower().encode()).hexdigest()}"
+
+    def issue(self, email, otp):
+        otp_key, attempts_key = self._keys(email)
+        self.cache.set(otp_key, hash_otp(email, otp), self.ttl)
+        self.cache.set(attempts_key, 0, self.ttl)
+
+    def verify(self, email, otp):
+        otp_key, attempts_key = self._keys(email)
+        stored = self.cache.get(otp_key)
+        if stored is None:
+            return OTP_MISSING
+        try:
+            attempts = self.cache.incr(attempts_key)
+        except ValueError:
+            # Counter evicted independently of the OTP; start it again.
+            self.cache.set(attempts_key, 1, self.ttl)
+            attempts = 1
+        if attempts > self.max_attempts:
+            return OTP_LOCKED
+        if not hmac.compare_digest(stored, hash_otp(email, otp)):
+            return OTP_INVALID
+        self.cache.delete_many([otp_key, attempts_key])
+        return OTP_OK
+
+    def discard(self, email):
+        self.cache.delete_many(self._keys(email))
+
+    def mark_verified(self, email):
+        self.cache.set(self._verified_key(email), True, self.ttl)
+
+    def consume_verified(self, email):
+        # delete() reports whether the key existed, so only one caller wins.
+        return self.cache.delete(self._verified_key(email))
+
+
+class LocalOTPStore(OTPStore):
+    """
+    Process-local OTPs for single-worker deployments and tests.
+
+    Expired entries are removed by a timing wheel: each entry sits in the
+    slot of the tick it expires on, and every call sweeps only the slots
+    whose tick has passed since the previous call, so expiry costs O(1) per
+    entry instead of a scan of the whole store.
+    """
+
+    def __init__(self, ttl, max_attempts, tick=1.0):
+        super().__init__(ttl, max_attempts)
+        self.tick = tick
+        self._entries = {}
+        self._wheel = [set() for _ in range(int(ttl // tick) + 2)]
+        self._cursor = self._tick_of(time.monotonic())
+        self._lock = threading.Lock()
+
+    def _tick_of(self, moment):
+        return int(moment // self.tick)
+
+    def _sweep(self, now):
+        current = self._tick_of(now)
+        span = min(current - self._cursor, len(self._wheel))
+        for tick in range(current - span + 1, current + 1):
+            slot = self._wheel[tick % len(self._wheel)]
+            for key in [k for k in slot if self._entries[k]["expires_at"] <= now]:
+                slot.discard(key)
+                del self._entries[key]
+        self._cursor = max(self._cursor, current)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._wheel[entry["slot"]].discard(key)
+
+    def _add(self, key, now, **fields):
+        self._remove(key)
+        expires_at = now + self.ttl
+        slot = self._tick_of(expires_at) % len(self._wheel)
+        self._entries[key] = dict(fields, expires_at=expires_at, slot=slot)
+        self._wheel[slot].add(key)
+
+    def issue(self, email, otp):
+        email = email.lower()
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            self._add(email, now, hash=hash_otp(email, otp), attempts=0)
+
+    def verify(self, email, otp):
+        email = email.lower()
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            entry = self._entries.get(email)
+            if entry is None:
+                return OTP_MISSING
+            if entry["expires_at"] <= now:
+                self._remove(email)
+                return OTP_EXPIRED
+            entry["attempts"] += 1
+            if entry["attempts"] > self.max_attempts:
+                return OTP_LOCKED
+            if not hmac.compare_digest(entry["hash"], hash_otp(email, otp)):
+                return OTP_INVALID
+            self._remove(email)
+            return OTP_OK
+
+    def discard(self, email):
+        with self._lock:
+            self._remove(email.lower())
+
+    # Markers share the wheel with the OTPs, under a key no email can collide with.
+
+    def mark_verified(self, email):
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            self._add(("verified", email.lower()), now)
+
+    def consume_verified(self, email):
+        key = ("verified", email.lower())
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            entry = self._entries.get(key)
+            self._remove(key)
+            return entry is not None and entry["expires_at"] > now
+
+
+def otp_store_class():
+    return import_string(getattr(settings, "OTP_STORE", "User_Auth.otp_store.CacheOTPStore"))
+
+
+@lru_cache(maxsize=None)
+def get_otp_store():
+    """Return the store configured by ``settings.OTP_STORE``."""
+    store_class = otp_store_class()
+    kwargs = {
+        "ttl": getattr(settings, "OTP_TTL_SECONDS", 300),
+        "max_attempts": getattr(settings, "OTP_MAX_ATTEMPTS", 5),
+    }
+    if issubclass(store_class, CacheOTPStore):
+        kwargs["alias"] = getattr(settings, "OTP_CACHE_ALIAS", "default")
+    return store_class(**kwargs)
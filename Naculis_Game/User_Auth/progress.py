@@ -0,0 +1,72 @@
+from django.db import transaction
+from django.db.models import F
+
+from . import economy
+from .hearts import spend_hearts
+from .levels import level_expression
+from .models import ProgressEvent, UserProfile
+from .signals import notify_profiles_updated
+from .streaks import record_activity
+
+
+def ingest_events(profile, events):
+    """
+    Apply a batch of ``{"id", "type", "amount"}`` progress events to one
+    profile and return a summary.
+
+    Events whose id was seen before are skipped. The rest are recorded in
+    one bulk INSERT, summed in memory, and applied as a single UPDATE of
+    F() increments (level included) plus one gem ledger entry, so the
+    whole batch costs a fixed handful of queries regardless of its size
+    and never overwrites progress made concurrently on another device. Hearts go through
+    spend_hearts(), which can't overdraw: lost hearts beyond the ones
+    available are dropped. A batch with new events counts today towards
+    the daily streak.
+    """
+    batch = {}
+    for event in events:
+        batch.setdefault(event['id'], event)
+
+    with transaction.atomic():
+        seen = set(
+            ProgressEvent.objects.filter(user_profile=profile, client_event_id__in=batch)
+            .values_list('client_event_id', flat=True)
+        )
+        new = [event for event_id, event in batch.items() if event_id not in seen]
+        # A concurrent request inserting the same ids fails here with IntegrityError.
+        ProgressEvent.objects.bulk_create([
+            ProgressEvent(
+                user_profile=profile,
+                client_event_id=event['id'],
+                kind=event['type'],
+                amount=event['amount'],
+            )
+            for event in new
+        ])
+
+        totals = {ProgressEvent.XP: 0, ProgressEvent.HEART_LOST: 0, ProgressEvent.GEM: 0}
+        for event in new:
+            totals[event['type']] += event['amount']
+
+        xp, gem = totals[ProgressEvent.XP], totals[ProgressEvent.GEM]
+        if xp:
+            UserProfile.objects.filter(pk=profile.pk).update(
+                xp=F('xp') + xp,
+                level=level_expression(F('xp') + xp),
+            )
+            notify_profiles_updated([profile.user_id])
+        if gem:
+            economy.credit(profile, gem=gem, reason='Progress events')
+        hearts_lost = totals[ProgressEvent.HEART_LOST]
+        if hearts_lost:
+            hearts_lost = spend_hearts(profile, hearts_lost, partial=True)
+        if new:
+            record_activity(profile)
+
+    return {
+        'accepted': len(new),
+        'duplicates': len(events) - len(new),
+        'xp': xp,
+        'gem': gem,
+        'hearts_lost': hearts_lost,
+    }
@@ -0,0 +1,48 @@
+import hashlib
+import hmac
+
+from django.conf import settings
+
+
+# Crockford base32: no I, L, O or U, so codes are easy to read out and type.
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+CODE_LENGTH = 8
+_HALF_BITS = 20                      # 2 * 20 bits == 32 ** 8 codes
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_ROUNDS = 4
+
+
+def _round_value(half, round_no):
+    key = settings.REFERRAL_CODE_KEY.encode()
+    digest = hmac.new(key, f"{round_no}:{half}".encode(), hashlib.sha256).digest()
+    return int.from_bytes(digest[:4], "big") & _HALF_MASK
+
+
+def _permute(number):
+    """Keyed Feistel permutation of the 40-bit integers."""
+    left, right = number >> _HALF_BITS, number & _HALF_MASK
+    for round_no in range(_ROUNDS):
+        left, right = right, left ^ _round_value(right, round_no)
+    return (left << _HALF_BITS) | right
+
+
+def encode_referral_code(number):
+    """
+    Map a unique id (the profile's user id) to an 8 character referral code.
+
+    The mapping is a bijection, so distinct ids can never share a code and
+    no uniqueness probing or retries are needed. Consecutive ids give
+    unrelated-looking codes because the permutation is keyed.
+    """
+    if not 0 <= number < len(ALPHABET) ** CODE_LENGTH:
+        raise ValueError("Referral code id out of range.")
+    value = _permute(number)
+    chars = []
+    for _ in range(CODE_LENGTH):
+        value, index = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[index])
+    return "".join(reversed(chars))
+
+
+def referral_link_for(code):
+    return f"http://127.0.0.1:8000/api/register/?ref={code}"
@@ -0,0 +1,126 @@
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+
+from .models import ReferralClosure
+
+
+TOP_REFERRERS_CACHE_KEY = "referrals:top:v2"
+TOP_REFERRERS_CACHE_SECONDS = 300
+
+
+def _table(closure_model):
+    return connection.ops.quote_name(closure_model._meta.db_table)
+
+
+def attach(profile_id, referrer_id, closure_model=ReferralClosure):
+    """
+    Hang ``profile_id`` and its whole downline under ``referrer_id``: every
+    upline of the referrer (and the referrer itself) becomes an ancestor of
+    every member of the subtree. One INSERT ... SELECT.
+    """
+    table = _table(closure_model)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (ancestor_id, descendant_id, depth)
+            SELECT up.ancestor_id, down.descendant_id, up.depth + down.depth + 1
+            FROM (SELECT ancestor_id, depth FROM {table} WHERE descendant_id = %s
+                  UNION ALL SELECT %s, 0) up
+            CROSS JOIN (SELECT descendant_id, depth FROM {table} WHERE ancestor_id = %s
+                        UNION ALL SELECT %s, 0) down
+            """,
+            [referrer_id, referrer_id, profile_id, profile_id],
+        )
+
+
+def detach(profile_id, closure_model=ReferralClosure):
+    """
+    Cut ``profile_id``'s subtree off from everything above it. The links
+    inside the subtree are kept.
+    """
+    closure_model.objects.filter(
+        ancestor_id__in=closure_model.objects.filter(descendant_id=profile_id).values('ancestor_id'),
+        descendant_id__in=(
+            closure_model.objects.filter(ancestor_id=profile_id).values('descendant_id')
+        ),
+    ).delete()
+    closure_model.objects.filter(descendant_id=profile_id).delete()
+
+
+def is_in_downline(profile_id, candidate_id):
+    return profile_id == candidate_id or ReferralClosure.objects.filter(
+        ancestor_id=profile_id, descendant_id=candidate_id
+    ).exists()
+
+
+def rebuild(profile_model, closure_model):
+    """
+    Recompute the whole closure table from ``referred_by`` one tree level at
+    a time: each pass is a single set-based INSERT ... SELECT. Migration
+    0023 carries its own copy of this for the initial build.
+    """
+    closure_table = _table(closure_model)
+    profile_table = connection.ops.quote_name(profile_model._meta.db_table)
+    closure_model.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {closure_table} (ancestor_id, descendant_id, depth)
+            SELECT referred_by_id, id, 1 FROM {profile_table} WHERE referred_by_id IS NOT NULL
+            """
+        )
+        depth = 1
+        while cursor.rowcount:
+            cursor.execute(
+                f"""
+                INSERT INTO {closure_table} (ancestor_id, descendant_id, depth)
+                SELECT c.ancestor_id, p.id, c.depth + 1
+                FROM {profile_table} p
+                JOIN {closure_table} c ON c.descendant_id = p.referred_by_id
+                WHERE c.depth = %s
+                """,
+                [depth],
+            )
+            depth += 1
+
+
+def downline_size(profile_id):
+    return ReferralClosure.objects.filter(ancestor_id=profile_id).count()
+
+
+def depth_histogram(profile_id):
+    """{depth: number of people at that depth} for one profile's downline."""
+    rows = (
+        ReferralClosure.objects.filter(ancestor_id=profile_id)
+        .values('depth')
+        .annotate(count=Count('id'))
+        .order_by('depth')
+    )
+    return {row['depth']: row['count'] for row in rows}
+
+
+def top_referrers(limit=10):
+    """
+    Profiles with the largest downlines. The aggregate scans the closure
+    table, so results are cached for TOP_REFERRERS_CACHE_SECONDS.
+    """
+    cached = cache.get(TOP_REFERRERS_CACHE_KEY)
+    # A short ranking is still a hit when it holds every referrer there is.
+    if cached is None or (len(cached['ranking']) < limit and not cached['complete']):
+        fetched = max(limit, 100)
+        ranking = list(
+            ReferralClosure.objects.values('ancestor_id', 'ancestor__user__username')
+            .annotate(downline=Count('id'))
+            .order_by('-downline', 'ancestor_id')[:fetched]
+        )
+        cached = {'ranking': ranking, 'complete': len(ranking) < fetched}
+        cache.set(TOP_REFERRERS_CACHE_KEY, cached, TOP_REFERRERS_CACHE_SECONDS)
+    return [
+        {
+            "profile_id": row['ancestor_id'],
+            "username": row['ancestor__user__username'],
+            "downline": row['downline'],
+        }
+        for row in cached['ranking'][:limit]
+    ]
@@ -0,0 +1,68 @@
+from django.db import transaction
+from django.db.models import F
+
+from . import economy
+from .levels import level_expression
+from .models import CustomUser, UserProfile, UserDiscount, LedgerEntry
+from .signals import notify_profiles_updated
+
+
+def create_user_with_profile(username, email, password, referral_code=None, phone=None):
+    """
+    Create a user, their profile and any referral rewards in one transaction.
+
+    Query budget: INSERT user + INSERT profile; a valid referral code adds
+    SELECT referrer, the referral closure INSERT ... SELECT, one bulk INSERT
+    for both discounts, one for both gem rewards and UPDATE referrer.
+    Uniqueness is left to the database constraints, so callers should be
+    ready for IntegrityError.
+    """
+    with transaction.atomic(savepoint=False):
+        referrer_profile = None
+        if referral_code:
+            referrer_profile = (
+                UserProfile.objects.select_related('user')
+                .filter(referral_code=referral_code.strip().upper())
+                .first()
+            )
+
+        user = CustomUser(username=username, email=email, phone=phone)
+        user.set_password(password)
+        if referrer_profile:
+            # Picked up by the create_user_profile signal so the profile is
+            # inserted already linked and rewarded, instead of re-saved.
+            user._profile_defaults = {
+                'referred_by': referrer_profile,
+                'xp': 10,
+            }
+        user.save()
+        user_profile = user.userprofile
+
+        if referrer_profile:
+            UserDiscount.objects.bulk_create([
+                # 50% discount to referee
+                UserDiscount(user_profile=user_profile, percent=50.00, reason='Referral Sign-up'),
+                # 20% discount to referrer
+                UserDiscount(
+                    user_profile=referrer_profile,
+                    percent=20.00,
+                    reason=f'Referral Reward (for referring {user.username})',
+                ),
+            ])
+
+            # Gems are ledger entries, so rewarding a busy referrer is insert-only.
+            LedgerEntry.objects.bulk_create([
+                economy.entry(user_profile, gem=5, reason='Referral Sign-up'),
+                economy.entry(referrer_profile, gem=1, reason=f'Referral Reward (for referring {user.username})'),
+            ])
+
+            # Referrer rewards as one atomic increment, so concurrent sign-ups on the
+            # same code can't lose updates; last, so the row lock is held briefly.
+            UserProfile.objects.filter(pk=referrer_profile.pk).update(
+                xp=F('xp') + 20,
+                level=level_expression(F('xp') + 20),
+                referral_count=F('referral_count') + 1,
+            )
+            notify_profiles_updated([referrer_profile.user_id])
+
+    return user
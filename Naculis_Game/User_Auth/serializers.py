@@ -1,9 +1,13 @@
 from rest_framework import serializers
-from .models import CustomUser, UserProfile, UserDiscount,PendingRegistration
+from .models import CustomUser, UserProfile, UserDiscount,PendingRegistration, ProgressEvent
 from django_countries.fields import CountryField
 import cloudinary.uploader
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.tokens import RefreshToken, TokenError
+from rest_framework_simplejwt.tokens import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from .tokens import IndexedRefreshToken
+from .registration import create_user_with_profile
+import zoneinfo
 from django.utils.translation import gettext_lazy as _
 
 
@@ -29,55 +33,9 @@ class RegisterSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
-        referral_code = validated_data.pop('referral_code', None)
-        password = validated_data.pop('password')
         validated_data.pop('confirm_password')
+        return create_user_with_profile(**validated_data)
 
-        # Create user and hash password
-        user = CustomUser(**validated_data)
-        user.set_password(password)
-        user.save()
-
-        user_profile = user.userprofile
-
-        if referral_code:
-            try:
-                referrer_profile = UserProfile.objects.get(referral_code=referral_code)
-                user_profile.referred_by = referrer_profile
-                user_profile.save()
-
-                # Referrer rewards
-                referrer_profile.xp += 20
-                referrer_profile.gem += 1
-                referrer_profile.referral_count += 1
-                referrer_profile.save()
-
-                # 50% discount to referee
-                UserDiscount.objects.create(
-                    user_profile=user_profile,
-                    percent=50.00,
-                    reason='Referral Sign-up'
-                )
-
-                # 20% discount to referrer
-                UserDiscount.objects.create(
-                    user_profile=referrer_profile,
-                    percent=20.00,
-                    reason=f'Referral Reward (for referring {user.username})'
-                )
-
-                # Extra rewards to new user
-                user_profile.xp += 10
-                user_profile.gem += 5
-                user_profile.save()
-
-            except UserProfile.DoesNotExist:
-                pass  # Invalid referral code
-
-        return user
-
-        return user
-    
 
 #start registration serializer
 class StartRegistrationSerializer(serializers.Serializer):
@@ -90,6 +48,8 @@ class StartRegistrationSerializer(serializers.Serializer):
     def validate(self, data):
         if data["password"] != data["confirm_password"]:
             raise serializers.ValidationError("Passwords do not match.")
+        if len(data["password"]) < 8:
+            raise serializers.ValidationError("Password must be at least 8 characters long.")
         return data
 
 
@@ -103,12 +63,15 @@ class VerifyRegistrationOTPSerializer(serializers.Serializer):
 
 
 
-class LoginSerializer(serializers.Serializer):
+class LoginCredentialsSerializer(serializers.Serializer):
+    """Field-level validation only; used by the async login path."""
     email = serializers.EmailField()
     username = serializers.CharField()
     password = serializers.CharField()
     remember_me = serializers.BooleanField(default=False)
 
+
+class LoginSerializer(LoginCredentialsSerializer):
     def validate(self, data):
         email = data.get('email')
         username = data.get('username')
@@ -163,12 +126,18 @@ class LogoutSerializer(serializers.Serializer):
 
     def save(self, **kwargs):
         try:
-            token = RefreshToken(self.token)
+            token = IndexedRefreshToken(self.token)
             token.blacklist()
         except TokenError:
             raise serializers.ValidationError("Invalid or expired token.")
 
 
+# Token refresh (blacklist check served from the in-process index)
+
+class IndexedTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = IndexedRefreshToken
+
+
 # Delete Account
 
 class DeleteAccountSerializer(serializers.Serializer):
@@ -187,7 +156,19 @@ class MessageResponseSerializer(serializers.Serializer):
 class UserDiscountSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserDiscount
-        fields = ['id', 'percent', 'reason', 'used', 'granted_at', 'used_at']
+        fields = ['id', 'percent', 'reason', 'used', 'granted_at', 'used_at', 'expires_at']
+
+class RedeemDiscountsSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), min_length=1, max_length=50)
+
+class CampaignGrantSerializer(serializers.Serializer):
+    campaign_id = serializers.SlugField(max_length=64)
+    percent = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0.01, max_value=100)
+    reason = serializers.CharField(max_length=64, required=False, allow_blank=True, default='')
+    country = serializers.CharField(max_length=2, required=False)
+    min_level = serializers.IntegerField(min_value=0, required=False)
+    max_level = serializers.IntegerField(min_value=0, required=False)
+    expires_at = serializers.DateTimeField(required=False)
 
 # User Profile Serializer
 class UserProfileSerializer(serializers.ModelSerializer):
@@ -196,7 +177,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
     first_name = serializers.CharField(required=False, allow_blank=True)
     last_name = serializers.CharField(required=False, allow_blank=True)
     country = serializers.CharField(source='country.name', read_only=True)  # Converts CountryField to a string
-    referred_by = serializers.CharField(source='referred_by.username', read_only=True)  # Add referrer info
+    referred_by = serializers.CharField(source='referred_by.user.username', read_only=True, default=None)  # Add referrer info
     discounts = UserDiscountSerializer(many=True, read_only=True)
     
     class Meta:
@@ -206,6 +187,10 @@ class UserProfileSerializer(serializers.ModelSerializer):
             'xp', 'daily_streak', 'level', 'hearts', 'gem', 'referred_by', 
             'referral_code', 'referral_link', 'referral_count', 'discount_used','discounts'
         ]
+        # level is derived from xp (levels.py); gems change through the ledger (economy.py);
+        # hearts only go down through hearts/spend/ and progress events, and refill on their own;
+        # xp is earned, and the streak kept, through progress/events/
+        read_only_fields = ['level', 'gem', 'hearts', 'xp', 'daily_streak']
 
     
     def update(self, instance, validated_data):
@@ -221,14 +206,17 @@ class UserProfileSerializer(serializers.ModelSerializer):
         instance.country = validated_data.get('country', instance.country)
         instance.gender = validated_data.get('gender', instance.gender)
         instance.profile_picture = validated_data.get('profile_picture', instance.profile_picture)
-        instance.xp = validated_data.get('xp', instance.xp)
-        instance.daily_streak = validated_data.get('daily_streak', instance.daily_streak)
-        instance.level = validated_data.get('level', instance.level)
-        instance.gem = validated_data.get('gem', instance.gem)
-        instance.hearts = validated_data.get('hearts', instance.hearts)
 
         instance.save()  # Save the updated UserProfile
         return instance
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['hearts'] = instance.current_hearts()  # regenerated lazily
+        # snapshot + unfolded ledger tail, pre-summed by snapshots.load_profile
+        data['gem'] = instance.gem + instance.gem_tail
+        return data
+
     def get_discounts(self, obj):
         return [
             {
@@ -242,12 +230,29 @@ class UserProfileSerializer(serializers.ModelSerializer):
             for d in obj.discounts.all()
         ]
     
+# Progress ingestion
+
+class ProgressEventSerializer(serializers.Serializer):
+    id = serializers.CharField(max_length=64)
+    type = serializers.ChoiceField(choices=ProgressEvent.KIND_CHOICES)
+    amount = serializers.IntegerField(min_value=1, max_value=100000, default=1)
+
+
+class ProgressBatchSerializer(serializers.Serializer):
+    events = ProgressEventSerializer(many=True, min_length=1, max_length=1000)
+
+
 class UserProfileUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserProfile
-        fields = ['phone', 'first_name', 'last_name', 'dob', 'gender', 'country', 'profile_picture', 'previous_profile_picture']
+        fields = ['phone', 'first_name', 'last_name', 'dob', 'gender', 'country', 'time_zone', 'profile_picture', 'previous_profile_picture']
         read_only_fields = ['previous_profile_picture']
 
+    def validate_time_zone(self, value):
+        if value not in zoneinfo.available_timezones():
+            raise serializers.ValidationError("Unknown time zone.")
+        return value
+
     def update(self, instance, validated_data):
         new_image = validated_data.get('profile_picture', None)
         if new_image:
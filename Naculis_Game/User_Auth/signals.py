@@ -1,12 +1,130 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
-from .models import CustomUser, UserProfile
+from .models import CustomUser, UserProfile, UserDiscount
+from .authentication import user_cache
+from .tokens import blacklist_index
+from . import referral_tree
+from .leaderboard import leaderboard
+from .versions import bump_profile_versions
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
 
 @receiver(post_save, sender=CustomUser)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
-        UserProfile.objects.create(user=instance)
+        UserProfile.objects.create(user=instance, **getattr(instance, '_profile_defaults', {}))
 
 @receiver(post_save, sender=CustomUser)
-def save_user_profile(sender, instance, **kwargs):
-    instance.userprofile.save()
+def save_user_profile(sender, instance, created, **kwargs):
+    # A fresh profile was just inserted above, and a profile that was never
+    # loaded can't have pending changes; otherwise save() writes only dirty columns.
+    if not created and CustomUser.userprofile.is_cached(instance):
+        instance.userprofile.save()
+
+
+# Keep CachedJWTAuthentication's user cache in step with the database
+@receiver([post_save, post_delete], sender=CustomUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # After commit: invalidating earlier lets a concurrent request re-cache
+    # the row as it was before this transaction.
+    user_id = instance.pk
+    transaction.on_commit(lambda: user_cache.invalidate(user_id))
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_cached_profile_user(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: user_cache.invalidate(user_id))
+
+
+# Profile snapshots (snapshots.py) are rebuilt whenever their version changes
+@receiver([post_save, post_delete], sender=CustomUser)
+def bump_user_profile_version(sender, instance, created=False, update_fields=None, **kwargs):
+    bump_profile_versions([instance.pk])
+    if not created and (update_fields is None or 'username' in update_fields):
+        # Referrals show this user's username as their referred_by.
+        bump_profile_versions(
+            UserProfile.objects.filter(referred_by__user_id=instance.pk).values_list('user_id', flat=True)
+        )
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def bump_profile_version(sender, instance, **kwargs):
+    bump_profile_versions([instance.user_id])
+
+@receiver(pre_delete, sender=UserProfile)
+def bump_referral_profile_versions(sender, instance, **kwargs):
+    # Their referred_by is about to be set to NULL without any save().
+    bump_profile_versions(instance.referrals.values_list('user_id', flat=True))
+
+@receiver([post_save, post_delete], sender=UserDiscount)
+def bump_discount_owner_version(sender, instance, **kwargs):
+    bump_profile_versions(
+        UserProfile.objects.filter(pk=instance.user_profile_id).values_list('user_id', flat=True)
+    )
+
+
+
+# Keep the ReferralClosure table in step with UserProfile.referred_by
+@receiver(post_save, sender=UserProfile)
+def maintain_referral_tree(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        if instance.referred_by_id:
+            referral_tree.attach(instance.pk, instance.referred_by_id)
+        return
+    if update_fields is not None and 'referred_by' not in update_fields:
+        return
+    # DirtyFieldsMixin still holds the pre-save values while post_save runs.
+    previous = getattr(instance, '_loaded_values', {}).get('referred_by_id', instance.referred_by_id)
+    if previous != instance.referred_by_id:
+        referral_tree.detach(instance.pk)
+        if instance.referred_by_id:
+            referral_tree.attach(instance.pk, instance.referred_by_id)
+
+@receiver(pre_delete, sender=UserProfile)
+def detach_referral_subtree(sender, instance, **kwargs):
+    # The profile's own closure rows cascade; its referrals' links to the
+    # profile's upline have to go as referred_by is set to NULL.
+    referral_tree.detach(instance.pk)
+
+@receiver(post_delete, sender=UserProfile)
+def decrement_referrer_count(sender, instance, **kwargs):
+    if instance.referred_by_id:
+        referrer = UserProfile.objects.filter(pk=instance.referred_by_id)
+        if referrer.update(referral_count=F('referral_count') - 1):
+            notify_profiles_updated(referrer.values_list('user_id', flat=True))
+
+
+
+# Incremental leaderboard updates
+@receiver(post_save, sender=UserProfile)
+def update_leaderboard(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'xp' in update_fields or 'country' in update_fields:
+        profile_id, xp, country = instance.pk, instance.xp, instance.country
+        transaction.on_commit(lambda: leaderboard.record(profile_id, xp, country))
+
+@receiver(post_delete, sender=UserProfile)
+def remove_from_leaderboard(sender, instance, **kwargs):
+    profile_id = instance.pk
+    transaction.on_commit(lambda: leaderboard.discard(profile_id))
+
+
+def notify_profiles_updated(user_ids):
+    """
+    Counterpart of the handlers above for writes that bypass save()
+    (queryset.update(), bulk operations): drops the cached copies and bumps
+    the profile versions once the surrounding transaction commits.
+    """
+    user_ids = list(user_ids)
+    bump_profile_versions(user_ids)
+
+    def invalidate():
+        for user_id in user_ids:
+            user_cache.invalidate(user_id)
+        leaderboard.mark_dirty(user_ids)
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def index_blacklisted_token(sender, instance, **kwargs):
+    blacklist_index.add(instance.token.jti, instance.token.expires_at)
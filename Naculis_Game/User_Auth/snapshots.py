@@ -0,0 +1,39 @@
+from django.conf import settings
+
+from .economy import with_balances
+from .hearts import regenerate
+from .models import UserProfile
+from .serializers import UserProfileSerializer
+from .versions import profile_cache, profile_version
+
+
+def load_profile(user_id):
+    """
+    The profile as UserProfileSerializer expects it, in two queries whatever
+    it holds: the profile joined to its user and referrer (with the ledger
+    tail summed in), and its discounts.
+    """
+    return (
+        with_balances(UserProfile.objects.select_related('user', 'referred_by__user'))
+        .prefetch_related('discounts')
+        .get(user_id=user_id)
+    )
+
+
+def profile_snapshot(user_id):
+    """
+    The serialized profile of a user. Built once per profile version and
+    kept in the shared profile cache, so a warm read costs no model queries; any write
+    to the profile, its user or its discounts bumps the version (see
+    versions.py and signals.py). Hearts regenerate with time rather than
+    with writes, so they are recomputed from the stored pair on every read.
+    """
+    cache = profile_cache()
+    key = f"profile-snapshot:{user_id}:{profile_version(user_id)}"
+    snapshot = cache.get(key)
+    if snapshot is None:
+        profile = load_profile(user_id)
+        snapshot = (dict(UserProfileSerializer(profile).data), profile.hearts, profile.hearts_refilled_at)
+        cache.set(key, snapshot, getattr(settings, "PROFILE_SNAPSHOT_TTL", 300))
+    data, hearts, hearts_refilled_at = snapshot
+    return {**data, "hearts": regenerate(hearts, hearts_refilled_at)[0]}
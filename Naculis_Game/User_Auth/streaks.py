@@ -0,0 +1,65 @@
+from datetime import timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import UserProfile
+from .signals import notify_profiles_updated
+
+
+def local_today(time_zone, now=None):
+    """The current date in ``time_zone`` (UTC if it isn't a known zone)."""
+    try:
+        zone = ZoneInfo(time_zone)
+    except (ZoneInfoNotFoundError, ValueError):
+        zone = ZoneInfo('UTC')
+    return (now or timezone.now()).astimezone(zone).date()
+
+
+def record_activity(profile):
+    """
+    Count today towards the profile's streak with conditional UPDATEs:
+    continue it if the last activity was yesterday, restart it otherwise,
+    and leave it alone if today was already counted.
+    """
+    today = local_today(profile.time_zone)
+    profiles = UserProfile.objects.filter(pk=profile.pk)
+    updated = profiles.filter(last_activity_date=today - timedelta(days=1)).update(
+        daily_streak=F('daily_streak') + 1, last_activity_date=today
+    ) or profiles.exclude(last_activity_date=today).update(
+        daily_streak=1, last_activity_date=today
+    )
+    if updated:
+        notify_profiles_updated([profile.user_id])
+    return bool(updated)
+
+
+def rollover_streaks(batch_size=5000, now=None, progress=None):
+    """
+    Reset every lapsed streak (no activity yesterday or today, local time)
+    to zero. Profiles are handled one time-zone bucket at a time with
+    set-based UPDATEs of at most ``batch_size`` rows, located through the
+    partial streak index; no model instances are loaded.
+    """
+    now = now or timezone.now()
+    live = UserProfile.objects.filter(daily_streak__gt=0)
+    reset = 0
+
+    for time_zone in live.order_by().values_list('time_zone', flat=True).distinct():
+        cutoff = local_today(time_zone, now) - timedelta(days=1)
+        lapsed = live.filter(time_zone=time_zone).filter(
+            Q(last_activity_date__lt=cutoff) | Q(last_activity_date__isnull=True)
+        )
+        while True:
+            rows = list(lapsed.values_list('id', 'user_id')[:batch_size])
+            if not rows:
+                break
+            # The UPDATE repeats the lapse test, so a streak continued by
+            # record_activity() since the SELECT is left alone.
+            reset += lapsed.filter(id__in=[profile_id for profile_id, _ in rows]).update(daily_streak=0)
+            notify_profiles_updated(user_id for _, user_id in rows)
+            if progress:
+                progress(time_zone, reset)
+
+    return reset
@@ -1,3 +1,1247 @@
-from django.test import TestCase
+import random
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, identify_hasher
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.mail.backends import locmem
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import F
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from . import economy, referral_codes, referral_tree
+from .authentication import user_cache
+from .campaigns import campaign_size, execute_run, queue_campaign
+from .checks import check_referral_code_key
+from .discounts import DiscountUnavailable, redeem, redeem_many
+from .hearts import regen_interval, spend_hearts
+from .leaderboard import Leaderboard, Ranking
+from .levels import level_for_xp, thresholds
+from .mail_queue import MailQueue
+from .models import (
+    CampaignRun, CustomUser, LedgerEntry, PendingRegistration, ProgressEvent, UserDiscount, UserProfile,
+)
+from .otp_store import LocalOTPStore, get_otp_store
+from .progress import ingest_events
+from .referral_codes import ALPHABET, CODE_LENGTH, encode_referral_code, referral_link_for
+from .registration import create_user_with_profile
+from .streaks import local_today, rollover_streaks
+from .tokens import BlacklistIndex
+
+
+def race(workers, target, attempts=200):
+    """
+    Run ``target(i)`` in ``workers`` threads released together; return the
+    results (or the exception each raised). SQLite's test database refuses
+    concurrent writers with "database table is locked" instead of waiting,
+    so such an attempt, which changed nothing, is retried like a client would.
+    """
+    barrier = threading.Barrier(workers)
+    results = [None] * workers
+
+    def run(i):
+        try:
+            barrier.wait()
+            for attempt in range(attempts):
+                try:
+                    results[i] = target(i)
+                    break
+                except OperationalError as exc:
+                    if 'locked' not in str(exc) or attempt == attempts - 1:
+                        raise
+                    time.sleep(random.uniform(0.001, 0.02))
+        except Exception as exc:
+            results[i] = exc
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+# In-memory caches, for tests that count queries (the database cache would
+# add its own) and for the race tests: a lock refused on the cache table
+# would surface from an on_commit hook after the write had committed, and
+# the retry would then report a lost race that was actually won.
+LOCMEM_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': alias}
+    for alias in ('default', 'otp', 'profiles')
+}
+
+
+class CreateUserQueryBudgetTests(TestCase):
+    """Sign-up is on the hot path; these pin the statement counts documented
+    on create_user_with_profile so a regression shows up as a failing test."""
+
+    def test_plain_signup(self):
+        # INSERT user + INSERT profile.
+        with self.assertNumQueries(2):
+            create_user_with_profile(username='plain', email='plain@example.com', password='pass12345')
+
+    def test_referred_signup(self):
+        referrer = create_user_with_profile(username='referrer', email='referrer@example.com', password='pass12345')
+        code = referrer.userprofile.referral_code
+
+        # SELECT referrer, INSERT user, INSERT profile, closure INSERT ... SELECT,
+        # discounts bulk INSERT, ledger bulk INSERT, UPDATE referrer.
+        with self.assertNumQueries(7):
+            user = create_user_with_profile(
+                username='referee', email='referee@example.com', password='pass12345', referral_code=code,
+            )
+
+        self.assertEqual(user.userprofile.referred_by_id, referrer.userprofile.pk)
+        self.assertEqual(UserDiscount.objects.filter(user_profile=referrer.userprofile).count(), 1)
+
+
+class VerifyRegistrationCaseTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        create_user_with_profile(username='Alice', email='Alice@Example.com', password='pass12345')
+
+    def _verify(self, email, username):
+        PendingRegistration.objects.create(
+            email=email,
+            username=username,
+            password='pass12345',
+            otp='123456',
+            expires_at=timezone.now() + timedelta(minutes=5),
+        )
+        return self.client.post('/api/verify-registration-otp/', {'email': email, 'otp': '123456'}, format='json')
+
+    def test_username_differing_only_in_case_is_rejected(self):
+        response = self._verify('other@example.com', 'alice')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CustomUser.objects.filter(username='alice').exists())
+
+    def test_email_differing_only_in_case_is_rejected(self):
+        response = self._verify('alice@example.com', 'someone')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(CustomUser.objects.filter(email__iexact='alice@example.com').count(), 1)
+
+    def test_new_user_verifies(self):
+        response = self._verify('bob@example.com', 'bob')
+        self.assertEqual(response.status_code, 201)
+
+
+class CaseInsensitiveUniqueMigrationTests(TransactionTestCase):
+    before = [('User_Auth', '0031_userdiscount_expires_at')]
+    after = [('User_Auth', '0032_customuser_case_insensitive_unique')]
+
+    def _migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        return executor.migrate(targets)
+
+    def tearDown(self):
+        self._migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_case_duplicates_stop_the_migration_with_their_names(self):
+        state = self._migrate(self.before)
+        User = state.apps.get_model('User_Auth', 'CustomUser')
+        User.objects.create(username='Alice', email='alice@example.com')
+        User.objects.create(username='alice', email='other@example.com')
+
+        with self.assertRaisesMessage(RuntimeError, "username 'alice' (user id"):
+            self._migrate(self.after)
+
+        User.objects.filter(username='alice').update(username='alice2')
+        self._migrate(self.after)
+
+
+class PasswordResetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        for name in ('carol', 'dave'):
+            create_user_with_profile(username=name, email=f'{name}@example.com', password='pass12345')
+
+    def _verify(self, email):
+        get_otp_store().issue(email, '123456')
+        return self.client.post('/api/verify-otp/', {'email': email, 'otp': '123456'}, format='json')
+
+    def _reset(self, email, password='newpass123'):
+        return self.client.post('/api/reset-password/', {
+            'email': email, 'new_password': password, 'confirm_password': password,
+        }, format='json')
+
+    def test_reset_needs_that_emails_verification(self):
+        self.assertEqual(self._verify('carol@example.com').status_code, 200)
+
+        self.assertEqual(self._reset('dave@example.com').status_code, 400)
+        self.assertEqual(self._reset('carol@example.com').status_code, 200)
+        self.assertTrue(CustomUser.objects.get(email='carol@example.com').check_password('newpass123'))
+        self.assertTrue(CustomUser.objects.get(email='dave@example.com').check_password('pass12345'))
+
+    def test_verification_allows_one_reset(self):
+        self._verify('carol@example.com')
+
+        self.assertEqual(self._reset('carol@example.com').status_code, 200)
+        self.assertEqual(self._reset('carol@example.com', 'another123').status_code, 400)
+
+    def test_local_store_marker_expires(self):
+        store = LocalOTPStore(ttl=0.05, max_attempts=5, tick=0.01)
+        store.mark_verified('Erin@example.com')
+        self.assertTrue(store.consume_verified('erin@example.com'))
+        self.assertFalse(store.consume_verified('erin@example.com'))
+
+        store.mark_verified('erin@example.com')
+        time.sleep(0.06)
+        self.assertFalse(store.consume_verified('erin@example.com'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RedeemRaceTests(TransactionTestCase):
+    """
+    Hundreds of redemptions of the same discount, released together. On
+    SQLite they take turns on one database lock: most attempts are refused
+    as "locked" and retried by race(), so this takes tens of seconds here
+    and shows serialised writers, not row-level contention.
+    """
+    workers = 200
+
+    def setUp(self):
+        self.profile = create_user_with_profile(
+            username='buyer', email='buyer@example.com', password='pass12345',
+        ).userprofile
+        self.first = UserDiscount.objects.create(user_profile=self.profile, percent=10, reason='test')
+        self.second = UserDiscount.objects.create(user_profile=self.profile, percent=20, reason='test')
+
+    def test_concurrent_redeem_has_one_winner(self):
+        results = race(self.workers, lambda i: redeem(self.profile, self.first.pk))
+
+        self.assertEqual(results.count(True), 1, results)
+        self.assertEqual(results.count(False), self.workers - 1, results)
+        self.first.refresh_from_db()
+        self.assertTrue(self.first.used)
+
+    def test_concurrent_redeem_many_has_one_winner(self):
+        ids = [self.first.pk, self.second.pk]
+        results = race(self.workers, lambda i: redeem_many(self.profile, ids))
+
+        winners = [r for r in results if r == sorted(ids)]
+        self.assertEqual(len(winners), 1, results)
+        self.assertTrue(all(isinstance(r, DiscountUnavailable) for r in results if r not in winners), results)
+        self.assertEqual(UserDiscount.objects.filter(pk__in=ids, used=True).count(), 2)
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class ReferralStressTests(TransactionTestCase):
+    workers = 10
+
+    def test_concurrent_signups_on_one_code_count_exactly(self):
+        referrer = create_user_with_profile(
+            username='referrer', email='referrer@example.com', password='pass12345',
+        ).userprofile
+        before_count, before_xp = referrer.referral_count, referrer.xp
+
+        results = race(self.workers, lambda i: create_user_with_profile(
+            username=f'referee{i}', email=f'referee{i}@example.com',
+            password='pass12345', referral_code=referrer.referral_code,
+        ))
+
+        self.assertTrue(all(isinstance(r, CustomUser) for r in results), results)
+        referrer.refresh_from_db()
+        self.assertEqual(referrer.referral_count, before_count + self.workers)
+        self.assertEqual(referrer.xp, before_xp + 20 * self.workers)
+        self.assertEqual(UserDiscount.objects.filter(user_profile=referrer).count(), self.workers)
+
+
+class ProfileUpdateTests(TestCase):
+    def setUp(self):
+        self.user = create_user_with_profile(username='frank', email='frank@example.com', password='pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_hearts_cannot_be_set_by_the_client(self):
+        response = self.client.put('/api/profile/', {'hearts': 99}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.user.userprofile.refresh_from_db()
+        self.assertEqual(self.user.userprofile.hearts, 5)
+
+    def test_xp_cannot_be_set_by_the_client(self):
+        response = self.client.put('/api/profile/', {'xp': 100000}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.user.userprofile.refresh_from_db()
+        self.assertEqual(self.user.userprofile.xp, 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SpendHeartsRaceTests(TransactionTestCase):
+    workers = 20
+
+    def test_concurrent_spends_stop_at_zero(self):
+        profile = create_user_with_profile(
+            username='hank', email='hank@example.com', password='pass12345',
+        ).userprofile
+
+        # Enough compare-and-set attempts that no spender gives up with HeartsBusy.
+        results = race(self.workers, lambda i: spend_hearts(profile, 1, attempts=1000))
+
+        self.assertEqual(results.count(1), 5, results)
+        self.assertEqual(results.count(0), self.workers - 5, results)
+        profile.refresh_from_db()
+        self.assertEqual(profile.hearts, 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, HEARTS_MAX=5, HEARTS_REGEN_SECONDS=1800)
+class HeartsRegenTests(TestCase):
+    def setUp(self):
+        self.user = create_user_with_profile(username='iris', email='iris@example.com', password='pass12345')
+        self.profile = self.user.userprofile
+        self.start = timezone.now().replace(microsecond=0)
+
+    def _at(self, intervals):
+        return mock.patch('django.utils.timezone.now', return_value=self.start + intervals * regen_interval())
+
+    def _store(self, hearts, refilled_at):
+        UserProfile.objects.filter(pk=self.profile.pk).update(hearts=hearts, hearts_refilled_at=refilled_at)
+        self.profile.refresh_from_db()
+
+    def test_hearts_regenerate_on_read(self):
+        self._store(2, self.start)
+
+        with self._at(2.5):
+            self.assertEqual(self.profile.current_hearts(), 4)
+        with self._at(10):
+            self.assertEqual(self.profile.current_hearts(), 5)
+        # Reads write nothing.
+        self.profile.refresh_from_db()
+        self.assertEqual((self.profile.hearts, self.profile.hearts_refilled_at), (2, self.start))
+
+    def test_spend_keeps_partial_regeneration(self):
+        self._store(2, self.start)
+
+        with self._at(1.5):
+            self.assertEqual(spend_hearts(self.profile, 1), 1)
+        self.profile.refresh_from_db()
+        # One heart had regenerated; the half interval towards the next is kept.
+        self.assertEqual((self.profile.hearts, self.profile.hearts_refilled_at), (2, self.start + regen_interval()))
+        with self._at(2):
+            self.assertEqual(self.profile.current_hearts(), 3)
+
+    def test_spending_from_full_starts_the_clock(self):
+        with self._at(0):
+            self.assertEqual(spend_hearts(self.profile, 2), 2)
+        self.profile.refresh_from_db()
+        self.assertEqual((self.profile.hearts, self.profile.hearts_refilled_at), (3, self.start))
+
+    def test_endpoint_refuses_at_zero(self):
+        self._store(1, self.start)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with self._at(0.5):
+            self.assertEqual(client.post('/api/hearts/spend/', {'count': 2}, format='json').status_code, 409)
+            response = client.post('/api/hearts/spend/', {'count': 1}, format='json')
+            self.assertEqual(response.data, {'spent': 1, 'hearts': 0})
+            self.assertEqual(client.post('/api/hearts/spend/', {'count': 1}, format='json').status_code, 409)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProfileSnapshotTests(TestCase):
+    def setUp(self):
+        referrer = create_user_with_profile(username='jade', email='jade@example.com', password='pass12345').userprofile
+        self.user = create_user_with_profile(
+            username='kurt', email='kurt@example.com', password='pass12345', referral_code=referrer.referral_code,
+        )
+        profile = self.user.userprofile
+        for percent in (5, 10):
+            UserDiscount.objects.create(user_profile=profile, percent=percent, reason='test')
+        economy.credit(profile, gem=7, reason='test')
+        self.gem = economy.balances(profile).gem  # the sign-up bonus plus these 7
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_cold_read_is_two_queries_and_warm_read_none(self):
+        # Profile + user + referrer + ledger tail in one query, discounts in the other.
+        with self.assertNumQueries(2):
+            cold = self.client.get('/api/profile/')
+        with self.assertNumQueries(0):
+            warm = self.client.get('/api/profile/')
+
+        self.assertEqual(cold.data, warm.data)
+        self.assertEqual((cold.data['gem'], cold.data['referred_by']), (self.gem, 'jade'))
+        self.assertEqual(len(cold.data['discounts']), UserDiscount.objects.filter(user_profile__user=self.user).count())
+
+    def test_put_response_includes_the_ledger_tail(self):
+        response = self.client.put('/api/profile/', {'first_name': 'Kurt'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['first_name'], response.data['gem']), ('Kurt', self.gem))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = create_user_with_profile(username='lars', email='lars@example.com', password='pass12345')
+        UserDiscount.objects.create(user_profile=self.user.userprofile, percent=10, reason='test')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_matching_etag_is_a_304_without_model_queries(self):
+        for url in ('/api/profile/', '/api/referral-code/', '/api/discounts/'):
+            etag = self.client.get(url)['ETag']
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual((response.status_code, response['ETag']), (304, etag), url)
+
+    def test_profile_write_changes_the_etag(self):
+        before = self.client.get('/api/profile/')['ETag']
+        profile = UserProfile.objects.get(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.first_name = 'Lars'
+            profile.save()
+
+        response = self.client.get('/api/profile/', HTTP_IF_NONE_MATCH=before)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], before)
+        self.assertEqual(response.data['first_name'], 'Lars')
+
+    def test_ledger_credit_changes_the_etag(self):
+        before = self.client.get('/api/profile/')
+        with self.captureOnCommitCallbacks(execute=True):
+            economy.credit(self.user.userprofile, gem=3, reason='test')
+
+        response = self.client.get('/api/profile/', HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['gem'], before.data['gem'] + 3)
+
+    def test_time_dependent_lists_have_no_etag(self):
+        for url in ('/api/discounts/?active=true', '/api/discounts/best/'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotIn('ETag', response, url)
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        self.profile = create_user_with_profile(
+            username='mona', email='mona@example.com', password='pass12345',
+        ).userprofile
+        self.start = economy.balances(self.profile)
+
+    def test_fold_keeps_live_balances_and_matches_the_ledger(self):
+        economy.credit(self.profile, balance='2.50', gem=4, reason='test')
+        economy.credit(self.profile, gem=-1, reason='test')
+        live = economy.balances(self.profile)
+
+        self.assertEqual(economy.fold(batch_size=1), LedgerEntry.objects.filter(user_profile=self.profile).count())
+        self.assertEqual(economy.balances(self.profile), live)
+        self.assertEqual(live.gem, self.start.gem + 3)
+        self.assertEqual(list(economy.inconsistent_profiles()), [])
+
+    def test_entry_committed_during_a_fold_stays_in_the_tail(self):
+        economy.credit(self.profile, gem=5, reason='test')
+        late = []
+
+        def credit_before_update(execute, sql, params, many, context):
+            if not late and sql.startswith(f'UPDATE "{UserProfile._meta.db_table}"'):
+                # Another request credits between the fold's SELECT and its UPDATEs.
+                late.append(economy.credit(self.profile, gem=100, reason='late'))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(credit_before_update):
+            folded = economy.fold(batch_size=10)
+
+        # The late entry is left for the next batch, then folded exactly once:
+        # marked without being summed would give +5, summed twice +205.
+        self.assertEqual(folded, LedgerEntry.objects.filter(user_profile=self.profile).count())
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.gem, self.start.gem + 105)
+        self.assertEqual(economy.balances(self.profile).gem, self.start.gem + 105)
+        self.assertEqual(list(economy.inconsistent_profiles()), [])
+
+    def test_check_ledger_reports_drift(self):
+        call_command('snapshot_ledger', stdout=StringIO())
+        call_command('check_ledger', stdout=StringIO())
+
+        UserProfile.objects.filter(pk=self.profile.pk).update(gem=F('gem') + 1)
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, '1 profiles disagree'):
+            call_command('check_ledger', batch_size=1, stdout=out)
+        self.assertIn(f'Profile {self.profile.pk}:', out.getvalue())
+
+
+class OpeningLedgerMigrationTests(TransactionTestCase):
+    def _migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        return executor.migrate(targets)
+
+    def tearDown(self):
+        self._migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_opening_entries_equal_the_snapshots(self):
+        state = self._migrate([('User_Auth', '0028_progressevent')])
+        User = state.apps.get_model('User_Auth', 'CustomUser')
+        Profile = state.apps.get_model('User_Auth', 'UserProfile')
+        for i, (balance, gem) in enumerate([(Decimal('12.50'), 30), (Decimal('0'), 0), (Decimal('-3.25'), 7)]):
+            user = User.objects.create(username=f'old{i}', email=f'old{i}@example.com')
+            Profile.objects.create(user=user, referral_code=f'OLD{i}', balance=balance, gem=gem)
+
+        self._migrate([('User_Auth', '0029_ledgerentry')])
+
+        self.assertEqual(list(economy.inconsistent_profiles(batch_size=2)), [])
+        self.assertEqual(LedgerEntry.objects.filter(folded=True).count(), 2)
+
+
+class FlakyEmailBackend(locmem.EmailBackend):
+    """locmem backend whose next ``failures`` sends raise."""
+    failures = 0
+    attempts = []
+    opened = 0
+
+    def open(self):
+        type(self).opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        type(self).attempts.append(time.monotonic())
+        if type(self).failures:
+            type(self).failures -= 1
+            raise ConnectionError('SMTP unavailable')
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='User_Auth.tests.FlakyEmailBackend')
+class MailQueueTests(SimpleTestCase):
+    def setUp(self):
+        FlakyEmailBackend.failures, FlakyEmailBackend.attempts, FlakyEmailBackend.opened = 0, [], 0
+        self.queue = MailQueue(workers=1, max_retries=3, backoff=0.05, idle_timeout=5)
+
+    def _message(self, n=0):
+        return EmailMessage(f'Hello {n}', 'body', 'from@example.com', [f'to{n}@example.com'])
+
+    def test_failed_send_is_retried_with_backoff(self):
+        FlakyEmailBackend.failures = 2
+        with self.assertLogs('User_Auth.mail_queue', 'ERROR'):
+            self.queue.enqueue(self._message())
+            self.assertTrue(self.queue.flush(timeout=5))
+
+        self.assertEqual(self.queue.metrics(), {'enqueued': 1, 'sent': 1, 'retried': 2, 'failed': 0, 'queued': 0})
+        self.assertEqual(len(mail.outbox), 1)
+        first, second, third = FlakyEmailBackend.attempts
+        self.assertGreaterEqual(second - first, 0.05)
+        self.assertGreaterEqual(third - second, 0.1)
+
+    def test_message_is_dropped_after_max_retries(self):
+        FlakyEmailBackend.failures = 10
+        with self.assertLogs('User_Auth.mail_queue', 'ERROR') as logs:
+            self.queue.enqueue(self._message())
+            self.assertTrue(self.queue.flush(timeout=5))
+
+        self.assertEqual(self.queue.metrics(), {'enqueued': 1, 'sent': 0, 'retried': 3, 'failed': 1, 'queued': 0})
+        self.assertEqual(len(logs.records), 4)
+        self.assertEqual(mail.outbox, [])
+
+    def test_flush_times_out_while_mail_is_waiting_to_be_retried(self):
+        self.queue.backoff = 10
+        FlakyEmailBackend.failures = 1
+        with self.assertLogs('User_Auth.mail_queue', 'ERROR'):
+            self.queue.enqueue(self._message())
+            self.assertFalse(self.queue.flush(timeout=0.2))
+        self.assertEqual(self.queue.metrics()['queued'], 1)
+
+    def test_a_batch_shares_one_connection(self):
+        for n in range(5):
+            self.queue.enqueue(self._message(n))
+        self.assertTrue(self.queue.flush(timeout=5))
+
+        self.assertEqual(FlakyEmailBackend.opened, 1)
+        self.assertEqual(sorted(m.subject for m in mail.outbox), [f'Hello {n}' for n in range(5)])
+        self.assertEqual(self.queue.metrics()['sent'], 5)
+
+
+class ReferralCodeTests(SimpleTestCase):
+    # 0, small ids, a spread of large ones, and the last valid id.
+    sample = [*range(2000), *random.Random(9).sample(range(len(ALPHABET) ** CODE_LENGTH), 2000), len(ALPHABET) ** CODE_LENGTH - 1]
+
+    def _decode(self, code):
+        """Inverse of encode_referral_code: base32 digits, then the Feistel rounds backwards."""
+        value = 0
+        for char in code:
+            value = value * len(ALPHABET) + ALPHABET.index(char)
+        left, right = value >> referral_codes._HALF_BITS, value & referral_codes._HALF_MASK
+        for round_no in reversed(range(referral_codes._ROUNDS)):
+            left, right = right ^ referral_codes._round_value(left, round_no), left
+        return (left << referral_codes._HALF_BITS) | right
+
+    def test_codes_round_trip(self):
+        codes = [encode_referral_code(number) for number in self.sample]
+
+        self.assertEqual(len(set(codes)), len(self.sample))
+        self.assertTrue(all(len(code) == CODE_LENGTH and set(code) <= set(ALPHABET) for code in codes))
+        self.assertEqual([self._decode(code) for code in codes], self.sample)
+
+    def test_ids_out_of_range_are_refused(self):
+        for number in (-1, len(ALPHABET) ** CODE_LENGTH):
+            with self.assertRaises(ValueError):
+                encode_referral_code(number)
+
+    def test_codes_depend_on_the_key(self):
+        before = [encode_referral_code(number) for number in range(100)]
+        with override_settings(REFERRAL_CODE_KEY='another-key'):
+            after = [encode_referral_code(number) for number in range(100)]
+        self.assertEqual(sum(a == b for a, b in zip(before, after)), 0)
+
+    def test_migration_0022_copy_matches_the_module(self):
+        frozen = import_module('User_Auth.migrations.0022_reissue_referral_codes')
+
+        self.assertEqual(
+            [frozen.encode_referral_code(number) for number in self.sample],
+            [encode_referral_code(number) for number in self.sample],
+        )
+        self.assertEqual(frozen.referral_link_for('ABC'), referral_link_for('ABC'))
+
+    def test_missing_key_fails_the_system_check(self):
+        for key in ('', None):
+            with override_settings(REFERRAL_CODE_KEY=key):
+                self.assertEqual([error.id for error in check_referral_code_key(None)], ['User_Auth.E002'])
+        self.assertEqual(check_referral_code_key(None), [])
+
+
+class ReferralCodeLookupTests(TestCase):
+    def test_code_is_matched_case_insensitively(self):
+        referrer = create_user_with_profile(username='nora', email='nora@example.com', password='pass12345').userprofile
+
+        referee = create_user_with_profile(
+            username='otto', email='otto@example.com', password='pass12345',
+            referral_code=f' {referrer.referral_code.lower()} ',
+        )
+
+        self.assertEqual(referee.userprofile.referred_by_id, referrer.pk)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LevelTests(TestCase):
+    """Every path that sets xp must land on level_for_xp(), including at the thresholds."""
+
+    def setUp(self):
+        table = thresholds()
+        self.xps = sorted({0, *(table[i] + delta for i in (0, 1, 2, len(table) // 2, -1) for delta in (-1, 0, 1))})
+        self.profiles = [
+            create_user_with_profile(username=f'lvl{i}', email=f'lvl{i}@example.com', password='pass12345').userprofile
+            for i in range(len(self.xps))
+        ]
+
+    def _levels(self):
+        return list(UserProfile.objects.filter(pk__in=[p.pk for p in self.profiles]).order_by('xp').values_list('xp', 'level'))
+
+    def _expected(self):
+        return [(xp, level_for_xp(xp)) for xp in self.xps]
+
+    def test_thresholds_start_their_level(self):
+        table = thresholds()
+        self.assertEqual([level_for_xp(xp) for xp in (0, table[0] - 1, table[0], table[-1] - 1, table[-1])],
+                         [0, 0, 1, len(table) - 1, len(table)])
+
+    def test_save(self):
+        for profile, xp in zip(self.profiles, self.xps):
+            profile.xp = xp
+            profile.save()
+        self.assertEqual(self._levels(), self._expected())
+
+    def test_referrer_reward_update(self):
+        rewarded = [(profile, xp) for profile, xp in zip(self.profiles, self.xps) if xp >= 20]
+        for i, (profile, xp) in enumerate(rewarded):
+            UserProfile.objects.filter(pk=profile.pk).update(xp=xp - 20)
+            create_user_with_profile(
+                username=f'ref{i}', email=f'ref{i}@example.com', password='pass12345', referral_code=profile.referral_code,
+            )
+        levels = dict(self._levels())
+        self.assertEqual([(xp, levels[xp]) for _, xp in rewarded], [(xp, level_for_xp(xp)) for _, xp in rewarded])
+
+    def test_progress_events(self):
+        for profile, xp in zip(self.profiles, self.xps):
+            if xp:
+                ingest_events(profile, [{'id': 'x', 'type': ProgressEvent.XP, 'amount': xp}])
+        self.assertEqual(self._levels(), self._expected())
+
+    def test_recompute_levels(self):
+        for profile, xp in zip(self.profiles, self.xps):
+            UserProfile.objects.filter(pk=profile.pk).update(xp=xp, level=-1)
+
+        call_command('recompute_levels', batch_size=3, stdout=StringIO())
+
+        self.assertEqual(self._levels(), self._expected())
+
+
+class BlacklistIndexTests(TestCase):
+    def setUp(self):
+        self.clock = mock.patch('User_Auth.tokens.time').start()
+        self.addCleanup(mock.patch.stopall)
+        self.clock.monotonic.return_value = 1000
+        self.index = BlacklistIndex(sync_interval=0, gap_timeout=60)
+
+    def _blacklist(self, row_id, expires_in=timedelta(days=1)):
+        token = OutstandingToken.objects.create(
+            jti=f'jti-{row_id}', token=f'token-{row_id}', expires_at=timezone.now() + expires_in,
+        )
+        BlacklistedToken.objects.create(id=row_id, token=token)
+        return token.jti
+
+    def test_lower_id_committed_after_the_watermark_is_picked_up(self):
+        self._blacklist(1)
+        self._blacklist(4)
+        self.assertTrue(self.index.contains('jti-4'))  # watermark 4; 2 and 3 are gaps
+
+        # Rows 2 and 3 got their ids earlier but commit only now, in reverse order.
+        self._blacklist(3)
+        self.clock.monotonic.return_value = 1010
+        self.assertTrue(self.index.contains('jti-3'))
+        self.assertEqual(set(self.index._gaps), {2})
+
+        self._blacklist(2)
+        self.clock.monotonic.return_value = 1020
+        self.assertTrue(self.index.contains('jti-2'))
+        self.assertEqual(self.index._gaps, {})
+
+    def test_gaps_age_out(self):
+        self._blacklist(1)
+        self._blacklist(3)
+        self.assertFalse(self.index.contains('jti-2'))
+        self.assertEqual(set(self.index._gaps), {2})
+
+        # A rolled-back id is dropped after gap_timeout and no longer queried.
+        self.clock.monotonic.return_value = 1060
+        self.index.contains('jti-1')
+        self.assertEqual(self.index._gaps, {})
+
+    def test_first_sync_only_tracks_recent_gaps(self):
+        self._blacklist(1)
+        self._blacklist(1500)
+
+        self.assertTrue(self.index.contains('jti-1'))
+        self.assertEqual(min(self.index._gaps), 501)  # the 999 ids below 1500
+        self.assertEqual(len(self.index._gaps), 999)
+
+    def test_expired_jtis_are_dropped(self):
+        self._blacklist(1, expires_in=timedelta(seconds=-1))
+        self._blacklist(2)
+
+        self.assertFalse(self.index.contains('jti-1'))
+        self.assertTrue(self.index.contains('jti-2'))
+
+
+class DirtyFieldsTests(TestCase):
+    def setUp(self):
+        create_user_with_profile(username='pia', email='pia@example.com', password='pass12345')
+        self.profile = UserProfile.objects.get(user__username='pia')
+
+    def _updates(self, queries):
+        return [q['sql'] for q in queries if q['sql'].startswith('UPDATE')]
+
+    def test_save_writes_only_changed_columns(self):
+        self.profile.first_name = 'Pia'
+        self.profile.gender = 'F'
+        with CaptureQueriesContext(connection) as queries:
+            self.profile.save()
+
+        [update] = self._updates(queries)
+        set_clause = update.split(' SET ')[1].split(' WHERE ')[0]
+        self.assertEqual(sorted(column.split(' = ')[0] for column in set_clause.split(', ')), ['"first_name"', '"gender"'])
+        self.assertEqual(UserProfile.objects.values_list('first_name', 'gender').get(pk=self.profile.pk), ('Pia', 'F'))
+
+    def test_unchanged_save_writes_nothing(self):
+        with self.assertNumQueries(0):
+            self.profile.save()
+        self.profile.first_name = self.profile.first_name
+        with self.assertNumQueries(0):
+            self.profile.save()
+
+    def test_saved_columns_are_clean_again(self):
+        self.profile.first_name = 'Pia'
+        self.profile.save()
+        self.assertEqual(self.profile.get_dirty_fields(), [])
+
+    def test_refresh_from_db_resets_the_snapshot(self):
+        UserProfile.objects.filter(pk=self.profile.pk).update(first_name='Elsewhere', last_name='Changed')
+
+        self.profile.refresh_from_db(fields=['first_name'])
+        self.assertEqual(self.profile.get_dirty_fields(), [])
+        self.profile.refresh_from_db()
+        self.profile.last_name = 'Here'
+        self.assertEqual(self.profile.get_dirty_fields(), ['last_name'])
+        with CaptureQueriesContext(connection) as queries:
+            self.profile.save()
+
+        [update] = self._updates(queries)
+        self.assertNotIn('"first_name"', update)
+        self.assertEqual(
+            UserProfile.objects.values_list('first_name', 'last_name').get(pk=self.profile.pk), ('Elsewhere', 'Here'),
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PASSWORD_HASHERS=[
+    'django.contrib.auth.hashers.MD5PasswordHasher', 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+])
+class AsyncLoginTests(TestCase):
+    """
+    Through the real process pool. Its workers load the project settings,
+    so passwords are stored as single-iteration PBKDF2: fast to verify there,
+    and outdated, so a correct login also takes the hash-upgrade path.
+    """
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='quinn', email='quinn@example.com')
+        self.user.password = PBKDF2PasswordHasher().encode('pass12345', 'somesalt', iterations=1)
+        self.user.save()
+        self.client = AsyncClient()
+
+    async def _login(self, password='pass12345', **credentials):
+        body = {'email': 'quinn@example.com', 'username': 'quinn', 'password': password, **credentials}
+        return await self.client.post('/api/login/async/', body, content_type='application/json')
+
+    async def test_login_returns_tokens_and_upgrades_the_hash(self):
+        response = await self._login()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()), {'access', 'refresh'})
+        user = await CustomUser.objects.aget(pk=self.user.pk)
+        self.assertEqual(identify_hasher(user.password).algorithm, 'md5')
+        self.assertTrue(user.check_password('pass12345'))
+
+    async def test_wrong_password_is_refused_without_rehashing(self):
+        response = await self._login('wrong-password')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'non_field_errors': ['Password is incorrect']})
+        self.assertEqual((await CustomUser.objects.aget(pk=self.user.pk)).password, self.user.password)
+
+    async def test_inactive_user_is_refused(self):
+        await CustomUser.objects.filter(pk=self.user.pk).aupdate(is_active=False)
+
+        response = await self._login()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'non_field_errors': ['User account is disabled']})
+
+    async def test_unknown_user_is_refused(self):
+        response = await self._login(username='nobody')
+
+        self.assertEqual(response.status_code, 400)
+
+
+class PruneProgressEventsTests(TestCase):
+    def test_prunes_only_events_past_retention(self):
+        profile = create_user_with_profile(username='gina', email='gina@example.com', password='pass12345').userprofile
+        ingest_events(profile, [{'id': f'e{i}', 'type': ProgressEvent.XP, 'amount': 1} for i in range(5)])
+        ProgressEvent.objects.filter(client_event_id__in=['e0', 'e1', 'e2']).update(
+            created_at=timezone.now() - timedelta(days=31),
+        )
+
+        call_command('prune_progress_events', days=30, batch_size=2, stdout=StringIO())
+
+        self.assertEqual(
+            sorted(ProgressEvent.objects.values_list('client_event_id', flat=True)), ['e3', 'e4'],
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class IngestEventsTests(TestCase):
+    def setUp(self):
+        self.profile = create_user_with_profile(
+            username='gus', email='gus@example.com', password='pass12345',
+        ).userprofile
+
+    def _events(self, kind, ids, amount=1):
+        return [{'id': event_id, 'type': kind, 'amount': amount} for event_id in ids]
+
+    def test_duplicate_ids_are_applied_once(self):
+        ingest_events(self.profile, self._events(ProgressEvent.XP, ['a', 'b'], 10))
+
+        summary = ingest_events(self.profile, self._events(ProgressEvent.XP, ['b', 'c', 'c'], 10))
+
+        self.assertEqual((summary['accepted'], summary['duplicates'], summary['xp']), (1, 2, 10))
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.xp, 30)
+        self.assertEqual(ProgressEvent.objects.filter(user_profile=self.profile).count(), 3)
+
+    def test_batch_is_one_aggregated_update(self):
+        profile_table = UserProfile._meta.db_table
+        ingest_events(self.profile, self._events(ProgressEvent.XP, ['warm-up']))  # counts today's streak
+        with CaptureQueriesContext(connection) as small:
+            ingest_events(self.profile, self._events(ProgressEvent.XP, ['s1']))
+        with CaptureQueriesContext(connection) as large:
+            ingest_events(self.profile, self._events(ProgressEvent.XP, [f'l{i}' for i in range(200)], 5))
+
+        # bulk_create may split the event INSERT to fit SQLite's parameter limit;
+        # everything else is the same fixed set of statements.
+        event_inserts = f'INSERT INTO "{ProgressEvent._meta.db_table}"'
+        self.assertEqual(
+            len([q for q in large if not q['sql'].startswith(event_inserts)]),
+            len([q for q in small if not q['sql'].startswith(event_inserts)]),
+        )
+        updates = [q['sql'] for q in large if q['sql'].startswith(f'UPDATE "{profile_table}"') and '"xp"' in q['sql']]
+        self.assertEqual(len(updates), 1, updates)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.xp, 2 + 1000)
+
+    def test_increments_keep_concurrent_progress(self):
+        stale = UserProfile.objects.get(pk=self.profile.pk)
+        UserProfile.objects.filter(pk=self.profile.pk).update(xp=500)  # another device
+
+        ingest_events(stale, self._events(ProgressEvent.XP, ['x'], 20))
+
+        self.assertEqual(UserProfile.objects.get(pk=self.profile.pk).xp, 520)
+
+    def test_hearts_lost_are_capped_at_the_hearts_available(self):
+        summary = ingest_events(self.profile, self._events(ProgressEvent.HEART_LOST, ['h1', 'h2'], 4))
+
+        self.assertEqual(summary['hearts_lost'], 5)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.hearts, 0)
+
+    def test_gems_go_through_the_ledger(self):
+        summary = ingest_events(self.profile, self._events(ProgressEvent.GEM, ['g1', 'g2'], 3))
+
+        self.assertEqual(summary['gem'], 6)
+        self.assertEqual(
+            list(LedgerEntry.objects.filter(user_profile=self.profile).values_list('gem_delta', flat=True)), [6],
+        )
+
+
+class StreakTests(TestCase):
+    def setUp(self):
+        self.profile = create_user_with_profile(
+            username='hana', email='hana@example.com', password='pass12345',
+        ).userprofile
+
+    def _ingest(self, event_id):
+        ingest_events(self.profile, [{'id': event_id, 'type': ProgressEvent.XP, 'amount': 1}])
+        self.profile.refresh_from_db()
+
+    def test_progress_events_keep_the_streak(self):
+        self._ingest('a')
+        self.assertEqual(self.profile.daily_streak, 1)
+        self._ingest('b')
+        self.assertEqual(self.profile.daily_streak, 1)
+
+        yesterday = local_today(self.profile.time_zone) - timedelta(days=1)
+        UserProfile.objects.filter(pk=self.profile.pk).update(last_activity_date=yesterday)
+        self._ingest('c')
+        self.assertEqual(self.profile.daily_streak, 2)
+
+    def test_rollover_resets_only_lapsed_streaks(self):
+        lapsed = create_user_with_profile(username='ivan', email='ivan@example.com', password='pass12345').userprofile
+        today = local_today(self.profile.time_zone)
+        UserProfile.objects.filter(pk=self.profile.pk).update(daily_streak=3, last_activity_date=today)
+        UserProfile.objects.filter(pk=lapsed.pk).update(daily_streak=3, last_activity_date=today - timedelta(days=2))
+
+        self.assertEqual(rollover_streaks(), 1)
+        self.assertEqual(UserProfile.objects.get(pk=self.profile.pk).daily_streak, 3)
+        self.assertEqual(UserProfile.objects.get(pk=lapsed.pk).daily_streak, 0)
+
+    def test_streak_cannot_be_set_by_the_client(self):
+        client = APIClient()
+        client.force_authenticate(self.profile.user)
+        client.put('/api/profile/', {'daily_streak': 50}, format='json')
+
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.daily_streak, 0)
+        self.assertIsNone(self.profile.last_activity_date)
+
+
+class ReconcileReferralCountsTests(TestCase):
+    def test_drifted_counts_are_recounted(self):
+        referrer = create_user_with_profile(username='jon', email='jon@example.com', password='pass12345').userprofile
+        for i in range(3):
+            create_user_with_profile(
+                username=f'kid{i}', email=f'kid{i}@example.com', password='pass12345',
+                referral_code=referrer.referral_code,
+            )
+        UserProfile.objects.filter(pk=referrer.pk).update(referral_count=7)
+
+        call_command('reconcile_referral_counts', batch_size=2, stdout=StringIO())
+
+        referrer.refresh_from_db()
+        self.assertEqual(referrer.referral_count, 3)
+        self.assertEqual(UserProfile.objects.filter(referral_count__gt=0).count(), 1)
+
+
+class CampaignRunTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser(username='root', email='root@example.com', password='pass12345')
+        for i in range(5):
+            create_user_with_profile(username=f'player{i}', email=f'player{i}@example.com', password='pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _post(self):
+        return self.client.post('/api/discounts/campaigns/', {'campaign_id': 'spring', 'percent': '15.00'}, format='json')
+
+    def test_api_queues_and_worker_runs(self):
+        self.assertEqual(self._post().status_code, 202)
+        self.assertEqual(CampaignRun.objects.get().status, CampaignRun.PENDING)
+
+        call_command('grant_campaign', pending=True, batch_size=2, stdout=StringIO())
+
+        status = self.client.get('/api/discounts/campaigns/spring/').data
+        self.assertEqual(status['status'], CampaignRun.DONE)
+        self.assertEqual(status['granted'], UserProfile.objects.count())
+
+    def test_live_run_refuses_a_second_post(self):
+        self._post()
+        CampaignRun.objects.update(status=CampaignRun.RUNNING, updated_at=timezone.now())
+
+        self.assertEqual(self._post().status_code, 409)
+
+    def test_stalled_run_is_resumed_from_its_checkpoint(self):
+        self._post()
+        first, *rest = UserProfile.objects.order_by('id').values_list('id', flat=True)
+        CampaignRun.objects.update(
+            status=CampaignRun.RUNNING, last_id=first, updated_at=timezone.now() - timedelta(hours=1),
+        )
+
+        self.assertTrue(execute_run(CampaignRun.objects.get()))
+
+        granted = set(UserDiscount.objects.filter(campaign_id='spring').values_list('user_profile_id', flat=True))
+        self.assertEqual(granted, set(rest))
+        self.assertEqual(CampaignRun.objects.get().status, CampaignRun.DONE)
+
+    def test_final_chunk_is_checkpointed(self):
+        run = queue_campaign('autumn', 10)
+        calls = []
+
+        self.assertTrue(execute_run(run, batch_size=2, progress=lambda *args: calls.append(args)))
+
+        total, last_id = UserProfile.objects.count(), UserProfile.objects.order_by('-id').values_list('id', flat=True)[0]
+        self.assertEqual(calls[-1], (total, last_id))
+        self.assertEqual(CampaignRun.objects.get().last_id, last_id)
+
+    def test_reclaimed_worker_stops_at_its_next_checkpoint(self):
+        run = queue_campaign('summer', 10)
+
+        def reclaim(granted, last_id):
+            CampaignRun.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+            execute_run(CampaignRun.objects.get(), batch_size=100)
+
+        self.assertFalse(execute_run(run, batch_size=2, progress=reclaim))
+        self.assertEqual(CampaignRun.objects.get().status, CampaignRun.DONE)
+        self.assertEqual(campaign_size('summer'), UserProfile.objects.count())
+
+
+class UserCacheInvalidationTests(TestCase):
+    def test_cached_user_is_dropped_when_the_change_commits(self):
+        user = create_user_with_profile(username='lena', email='lena@example.com', password='pass12345')
+        user_cache.set(user.pk, user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.first_name = 'Lena'
+            user.save()
+            # Still in the transaction: another request must not re-cache the old row.
+            self.assertIsNotNone(user_cache.get(user.pk))
+
+        self.assertIsNone(user_cache.get(user.pk))
+
+
+class PurgePendingRegistrationsTests(TestCase):
+    def test_only_expired_rows_are_purged(self):
+        now = timezone.now()
+        for email, expires_at in (('old@example.com', now - timedelta(minutes=1)), ('new@example.com', now + timedelta(minutes=5))):
+            PendingRegistration.objects.create(
+                email=email, username=email.split('@')[0], password='x', otp='123456', expires_at=expires_at,
+            )
+
+        call_command('purge_pending_registrations', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(list(PendingRegistration.objects.values_list('email', flat=True)), ['new@example.com'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TopReferrersCacheTests(TestCase):
+    def test_short_complete_ranking_is_served_from_cache(self):
+        referrer = create_user_with_profile(username='mia', email='mia@example.com', password='pass12345').userprofile
+        create_user_with_profile(
+            username='ned', email='ned@example.com', password='pass12345', referral_code=referrer.referral_code,
+        )
+
+        first = referral_tree.top_referrers(10)
+        with self.assertNumQueries(0):
+            self.assertEqual(referral_tree.top_referrers(10), first)
+        self.assertEqual([row['username'] for row in first], ['mia'])
+
+
+class FakeLoadLeaderboard(Leaderboard):
+    """Loads fixed rows; loads after the first wait for ``release``."""
+
+    def __init__(self, rows, rebuild_interval):
+        super().__init__(rebuild_interval)
+        self.rows = rows
+        self.loads = 0
+        self.release = threading.Event()
+
+    def _load(self):
+        self.loads += 1
+        if self.loads > 1:
+            self.release.wait(5)
+        else:
+            time.sleep(0.05)
+        return Ranking(self.rows), {}, {}
+
+
+class LeaderboardRebuildTests(SimpleTestCase):
+    def test_concurrent_first_lookups_build_once(self):
+        board = FakeLoadLeaderboard([(1, 10)], rebuild_interval=3600)
+        threads = [threading.Thread(target=board.top, args=(10,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(board.loads, 1)
+
+    def test_stale_ranking_is_served_while_rebuilding(self):
+        board = FakeLoadLeaderboard([(1, 10), (2, 20)], rebuild_interval=0)
+        board.top(10)  # builds, then starts a background rebuild (interval 0)
+        board.rebuild_interval = 3600
+
+        board.record(1, 50, None)
+        # The rebuild is still loading; the current ranking answers meanwhile.
+        self.assertEqual(board.top(10), [(1, 1, 50), (2, 2, 20)])
+
+        board.release.set()
+        board._rebuild_thread.join(5)
+        self.assertEqual(board.loads, 2)
+        # The load predates record(1, 50); the change is carried over.
+        self.assertEqual(board.top(10), [(1, 1, 50), (2, 2, 20)])
+
+
+class RankingTests(SimpleTestCase):
+    def setUp(self):
+        self.ranking = Ranking([(1, 10), (2, 20), (3, 20), (4, 5)])
+
+    def test_ties_are_ordered_by_profile_id(self):
+        self.assertEqual(self.ranking.entries(0, 10), [(1, 2, 20), (2, 3, 20), (3, 1, 10), (4, 4, 5)])
+        self.assertEqual([self.ranking.rank(pid) for pid in (1, 2, 3, 4)], [3, 1, 2, 4])
+        self.assertIsNone(self.ranking.rank(99))
+
+    def test_entries_are_clipped_at_both_ends(self):
+        self.assertEqual(self.ranking.entries(-2, 1), [(1, 2, 20)])
+        self.assertEqual(self.ranking.entries(3, 10), [(4, 4, 5)])
+        self.assertEqual(self.ranking.entries(4, 10), [])
+
+    def test_set_and_discard_move_profiles(self):
+        self.ranking.set(4, 30)
+        self.assertEqual(self.ranking.rank(4), 1)
+        self.ranking.set(2, 10)
+        self.assertEqual(self.ranking.entries(0, 10), [(1, 4, 30), (2, 3, 20), (3, 1, 10), (4, 2, 10)])
+
+        self.ranking.discard(3)
+        self.ranking.discard(99)
+        self.assertEqual(len(self.ranking), 3)
+        self.assertNotIn(3, self.ranking)
+        self.assertEqual(self.ranking.entries(0, 10), [(1, 4, 30), (2, 1, 10), (3, 2, 10)])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LeaderboardViewTests(TestCase):
+    def setUp(self):
+        # A fresh board per test, shared by the views and the signal handlers.
+        self.board = Leaderboard(rebuild_interval=3600)
+        for target in ('User_Auth.views.leaderboard', 'User_Auth.signals.leaderboard'):
+            patcher = mock.patch(target, self.board)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.profiles = {}
+        for name, xp, country in (('olga', 50, 'NP'), ('pete', 30, 'IN'), ('quin', 30, 'NP'), ('rita', 10, None)):
+            profile = create_user_with_profile(
+                username=name, email=f'{name}@example.com', password='pass12345',
+            ).userprofile
+            UserProfile.objects.filter(pk=profile.pk).update(xp=xp, country=country)
+            self.profiles[name] = profile.pk
+        self.client = APIClient()
+
+    def _get(self, username, url):
+        self.client.force_authenticate(CustomUser.objects.get(username=username))
+        return self.client.get(url)
+
+    def _ranked(self, rows):
+        return [(row['rank'], row['username'], row['xp']) for row in rows]
+
+    def test_top(self):
+        response = self._get('rita', '/api/leaderboard/?limit=3')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self._ranked(response.data['results']), [(1, 'olga', 50), (2, 'pete', 30), (3, 'quin', 30)],
+        )
+
+    def test_me_at_the_first_and_last_rank(self):
+        first = self._get('olga', '/api/leaderboard/me/?around=1').data
+        self.assertEqual(first['rank'], 1)
+        self.assertEqual(self._ranked(first['neighbours']), [(1, 'olga', 50), (2, 'pete', 30)])
+
+        last = self._get('rita', '/api/leaderboard/me/?around=1').data
+        self.assertEqual(last['rank'], 4)
+        self.assertEqual(self._ranked(last['neighbours']), [(3, 'quin', 30), (4, 'rita', 10)])
+
+    def test_country(self):
+        data = self._get('quin', '/api/leaderboard/country/').data
+
+        self.assertEqual((data['country'], data['rank']), ('NP', 2))
+        self.assertEqual(self._ranked(data['results']), [(1, 'olga', 50), (2, 'quin', 30)])
+        self.assertEqual(self._get('rita', '/api/leaderboard/country/').status_code, 400)
+
+    def test_saved_country_change_moves_between_partitions(self):
+        self._get('olga', '/api/leaderboard/country/')  # builds the board
+        profile = UserProfile.objects.get(pk=self.profiles['olga'])
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.country = 'IN'
+            profile.save()
+
+        self.assertEqual(self._ranked(self._get('quin', '/api/leaderboard/country/').data['results']), [(1, 'quin', 30)])
+        india = self._get('pete', '/api/leaderboard/country/').data
+        self.assertEqual(india['rank'], 2)
+        self.assertEqual(self._ranked(india['results']), [(1, 'olga', 50), (2, 'pete', 30)])
+
+    def test_deleted_profile_leaves_the_board(self):
+        self.board.top(10)
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.get(username='olga').delete()
+
+        self.assertEqual([pid for _, pid, _ in self.board.top(10)], [self.profiles[n] for n in ('pete', 'quin', 'rita')])
+
+    def test_dirty_profiles_are_reread(self):
+        self.board.top(10)
+        rita = CustomUser.objects.get(username='rita')
+        UserProfile.objects.filter(user=rita).update(xp=100)
+        self.board.mark_dirty([rita.pk])
+
+        self.assertEqual(self.board.top(1), [(1, self.profiles['rita'], 100)])
+
+    def test_save_landing_during_the_dirty_reread_is_kept(self):
+        self.board.top(10)
+        rita = CustomUser.objects.get(username='rita')
+        UserProfile.objects.filter(user=rita).update(xp=100)
+        self.board.mark_dirty([rita.pk])
+
+        def save_after_select(execute, sql, params, many, context):
+            result = execute(sql, params, many, context)
+            # A later save commits (and is recorded) before the SELECT's rows are applied.
+            self.board.record(self.profiles['rita'], 200, None)
+            return result
+
+        with connection.execute_wrapper(save_after_select):
+            self.board._refresh()
+        self.assertEqual(self.board.top(1), [(1, self.profiles['rita'], 200)])
@@ -0,0 +1,104 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+class BlacklistIndex:
+    """
+    In-process index of blacklisted JTIs (jti -> expiry).
+
+    The index is warmed from the database on first use and then topped up
+    incrementally: new BlacklistedToken rows are read past a high-water mark
+    at most every ``sync_interval`` seconds, and rows blacklisted by this
+    process are added straight away by the post_save handler in
+    ``signals.py``. Expired JTIs are dropped during syncs since simplejwt
+    rejects expired tokens before the blacklist is consulted.
+
+    Ids are handed out at INSERT, not at commit, so a row can become visible
+    after rows with higher ids were already read. Ids skipped below the mark
+    are therefore remembered as gaps and looked up again (by primary key)
+    on every sync for ``gap_timeout`` seconds, long enough for any sane
+    transaction to commit; gaps left by rollbacks simply age out.
+    """
+
+    max_gaps = 10000
+
+    def __init__(self, sync_interval, gap_timeout=60):
+        self.sync_interval = sync_interval
+        self.gap_timeout = gap_timeout
+        self._jtis = {}
+        self._watermark = 0
+        self._gaps = {}  # skipped id -> monotonic time it was first missed
+        self._synced_at = None
+        self._lock = threading.Lock()
+
+    def _sync(self):
+        rows = (
+            BlacklistedToken.objects
+            .filter(Q(id__gt=self._watermark) | Q(id__in=list(self._gaps)))
+            .order_by("id")
+            .values_list("id", "token__jti", "token__expires_at")
+        )
+        now = timezone.now()
+        seen = set()
+        for row_id, jti, expires_at in rows.iterator(chunk_size=5000):
+            if expires_at > now:
+                self._jtis[jti] = expires_at
+            seen.add(row_id)
+
+        synced_at = time.monotonic()
+        previous = self._watermark
+        self._watermark = max([previous, *seen])
+        # On the first warm-up only the most recent ids can still be in flight.
+        start = previous or max(self._watermark - 1000, 0)
+        for row_id in range(start + 1, self._watermark):
+            if row_id not in seen:
+                self._gaps.setdefault(row_id, synced_at)
+        self._gaps = {
+            row_id: missed_at for row_id, missed_at in self._gaps.items()
+            if row_id not in seen and synced_at - missed_at < self.gap_timeout
+        }
+        if len(self._gaps) > self.max_gaps:
+            self._gaps = dict(sorted(self._gaps.items())[-self.max_gaps:])
+
+        self._jtis = {jti: exp for jti, exp in self._jtis.items() if exp > now}
+        self._synced_at = synced_at
+
+    def contains(self, jti):
+        with self._lock:
+            if self._synced_at is None or time.monotonic() - self._synced_at >= self.sync_interval:
+                self._sync()
+            return jti in self._jtis
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._jtis[jti] = expires_at
+
+    def reset(self):
+        with self._lock:
+            self._jtis.clear()
+            self._watermark = 0
+            self._gaps.clear()
+            self._synced_at = None
+
+
+blacklist_index = BlacklistIndex(
+    sync_interval=getattr(settings, "TOKEN_BLACKLIST_SYNC_SECONDS", 5),
+    gap_timeout=getattr(settings, "TOKEN_BLACKLIST_GAP_SECONDS", 60),
+)
+
+
+class IndexedRefreshToken(RefreshToken):
+    """RefreshToken whose blacklist check is answered by ``blacklist_index``."""
+
+    def check_blacklist(self):
+        if blacklist_index.contains(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
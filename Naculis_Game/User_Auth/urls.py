@@ -1,10 +1,12 @@
 from django.urls import path
 from .views import *
+from rest_framework_simplejwt.views import TokenRefreshView
 
 urlpatterns = [
     path("start-registration/", StartRegistrationView.as_view()),
     path("verify-registration-otp/", VerifyRegistrationOTPView.as_view()),
     path('login/', LoginView.as_view(), name='login'),
+    path('login/async/', async_login_view, name='login_async'),
 
     path('send-otp/', SendOTPView.as_view(), name='send_otp'),
     path('resend-otp/', ResendOTPView.as_view(), name='resend_otp'),
@@ -12,6 +14,7 @@ urlpatterns = [
 
     path('reset-password/', ResetPasswordView.as_view(), name='reset_password'),
 
+    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('delete-account/', DeleteAccountView.as_view(), name='delete_account'),
 
@@ -21,12 +24,26 @@ urlpatterns = [
 
     path('referral-link/', ReferralLinkView.as_view(), name='referral-link'),
     path('referral-code/', ReferralCodeView.as_view(), name='referral-code'),
+    path('referrals/downline/', ReferralDownlineView.as_view(), name='referral-downline'),
+    path('referrals/top/', TopReferrersView.as_view(), name='top-referrers'),
+
+    #leaderboard
+    path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('leaderboard/me/', MyLeaderboardRankView.as_view(), name='leaderboard-me'),
+    path('leaderboard/country/', CountryLeaderboardView.as_view(), name='leaderboard-country'),
+
+    path('hearts/spend/', SpendHeartsView.as_view(), name='spend-hearts'),
+    path('progress/events/', ProgressEventsView.as_view(), name='progress-events'),
 
     #discount
     path('discounts/', UserDiscountListView.as_view(), name='user-discount-list'),
+    path('discounts/best/', BestDiscountView.as_view(), name='best-discount'),
     path('discounts/<int:pk>/', UserDiscountDetailView.as_view(), name='user-discount-detail'),
     path('discounts/create/', AdminCreateDiscountView.as_view(), name='admin-create-discount'),
     path('discounts/<int:pk>/use/', UseDiscountView.as_view(), name='use-discount'),
+    path('discounts/use/', UseDiscountsView.as_view(), name='use-discounts'),
+    path('discounts/campaigns/', AdminGrantCampaignView.as_view(), name='admin-grant-campaign'),
+    path('discounts/campaigns/<slug:campaign_id>/', AdminCampaignStatusView.as_view(), name='admin-campaign-status'),
     path('discounts/<int:pk>/delete/', AdminDeleteDiscountView.as_view(), name='admin-delete-discount'),
 
 ]
\ No newline at end of file
@@ -0,0 +1,53 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+EPOCH_KEY = "profile-version:epoch"
+
+
+def profile_cache():
+    """The shared cache holding profile versions and snapshots (PROFILE_CACHE_ALIAS)."""
+    return caches[getattr(settings, "PROFILE_CACHE_ALIAS", "default")]
+
+
+def _key(user_id):
+    return f"profile-version:{user_id}"
+
+
+def _token():
+    return uuid.uuid4().hex
+
+
+def profile_version(user_id):
+    """
+    Opaque token that changes whenever anything shown on the user's profile
+    may have changed. Made of a global epoch (bumped by changes touching
+    many profiles at once) and a per-user stamp, both kept in the shared
+    profile cache so every worker agrees (a system check in checks.py
+    refuses process-local backends). A stamp that was evicted is replaced by a
+    new one rather than a default, so a token is never reused.
+    """
+    cache = profile_cache()
+    keys = [EPOCH_KEY, _key(user_id)]
+    stamps = cache.get_many(keys)
+    for key in keys:
+        if key not in stamps:
+            cache.add(key, _token(), None)  # keeps a racing worker's token
+            stamps[key] = cache.get(key)
+    return f"{stamps[EPOCH_KEY]}.{stamps[_key(user_id)]}"
+
+
+def bump_profile_versions(user_ids):
+    """Give each user's profile a new version once the current transaction commits."""
+    user_ids = list(user_ids)
+    if user_ids:
+        transaction.on_commit(
+            lambda: profile_cache().set_many({_key(user_id): _token() for user_id in user_ids}, None)
+        )
+
+
+def bump_all_profile_versions():
+    transaction.on_commit(lambda: profile_cache().set(EPOCH_KEY, _token(), None))
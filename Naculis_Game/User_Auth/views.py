@@ -2,12 +2,14 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.core.mail import send_mail
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from datetime import timedelta
 from django.contrib.auth import authenticate
 import random
+import json
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.utils.translation import gettext_lazy as _
 
@@ -16,23 +18,36 @@ from django.conf import settings
 from django.utils.translation import gettext as _
 from rest_framework import generics, permissions, status
 from django.utils import timezone
+from django.db import IntegrityError, transaction
 
 
-from .models import CustomUser, UserProfile, UserDiscount,PendingRegistration
+from .models import CustomUser, UserProfile, UserDiscount,PendingRegistration, CampaignRun
+from .hashing import acheck_password
+from .mail_queue import enqueue_mail
+from .registration import create_user_with_profile
+from .referral_codes import referral_link_for
+from . import referral_tree
+from .leaderboard import leaderboard, with_usernames
+from .hearts import spend_hearts, HeartsBusy
+from .progress import ingest_events
+from .discounts import applicable_discounts, best_discount, redeem, redeem_many, DiscountUnavailable
+from .campaigns import queue_campaign, campaign_size, CampaignRunning
+from .snapshots import load_profile, profile_snapshot
+from .conditional import ConditionalGetMixin
+from .otp_store import get_otp_store, OTP_OK, OTP_EXPIRED, OTP_INVALID, OTP_LOCKED
 
 
 
 
 
 from .serializers import (
-   RegisterSerializer, StartRegistrationSerializer, VerifyRegistrationOTPSerializer, LoginSerializer, EmailOTPSerializer,
-    UserProfileSerializer, UserProfileUpdateSerializer, UserDiscountSerializer, LogoutSerializer
+    StartRegistrationSerializer, VerifyRegistrationOTPSerializer, LoginSerializer, LoginCredentialsSerializer, EmailOTPSerializer,
+    UserProfileSerializer, UserProfileUpdateSerializer, UserDiscountSerializer, LogoutSerializer, ProgressBatchSerializer,
+    RedeemDiscountsSerializer, CampaignGrantSerializer
 )
 
 
 User = get_user_model()
-otp_storage = {}         # Temporary in-memory OTP store
-verified_email = {}      # Temporary email verification store
 
 #language set
 
@@ -59,10 +74,10 @@ class StartRegistrationView(APIView):
         email = data["email"]
         username = data["username"]
 
-        # Don't register if user already exists
-        if User.objects.filter(email=email).exists():
+        # Don't register if user already exists (verification relies on this check)
+        if User.objects.filter(email__iexact=email).exists():
             return Response({"error": "Email already registered."}, status=400)
-        if User.objects.filter(username=username).exists():
+        if User.objects.filter(username__iexact=username).exists():
             return Response({"error": "Username already taken."}, status=400)
 
         # Generate OTP
@@ -81,19 +96,15 @@ class StartRegistrationView(APIView):
             otp=otp,
             expires_at=expires_at,
             referral_code=referral_code,
-            referral_link=f"http://127.0.0.1:8000/api/register/?ref={referral_code}" if referral_code else None
+            referral_link=referral_link_for(referral_code) if referral_code else None
         )
 
-        # Send OTP
-        try:
-            send_mail(
-                subject="Verify your email",
-                message=f"Your OTP is: {otp}. It expires in 5 minutes.",
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[email],
-            )
-        except Exception as e:
-            return Response({"error": f"Failed to send OTP: {str(e)}"}, status=500)
+        # Send OTP (delivered in the background by the mail queue)
+        enqueue_mail(
+            subject="Verify your email",
+            message=f"Your OTP is: {otp}. It expires in 5 minutes.",
+            recipient_list=[email],
+        )
 
         return Response({"msg": "OTP sent to your email. Please verify to complete registration."}, status=200)
 
@@ -110,71 +121,134 @@ class VerifyRegistrationOTPView(APIView):
 
         data = serializer.validated_data
         try:
-            pending = PendingRegistration.objects.get(email=data["email"])
-        except PendingRegistration.DoesNotExist:
-            return Response({"error": "No pending registration found."}, status=404)
+            with transaction.atomic():
+                try:
+                    pending = PendingRegistration.objects.get(email=data["email"])
+                except PendingRegistration.DoesNotExist:
+                    return Response({"error": "No pending registration found."}, status=404)
+
+                if pending.is_expired():
+                    pending.delete()
+                    return Response({"error": "OTP has expired."}, status=400)
+
+                if data["otp"] != pending.otp:
+                    return Response({"error": "Invalid OTP."}, status=400)
+
+                # All checks passed – create the user. Password and uniqueness were
+                # validated by StartRegistrationView; the case-insensitive unique
+                # constraints on CustomUser catch races and "Alice" vs "alice".
+                user = create_user_with_profile(
+                    username=pending.username,
+                    email=pending.email,
+                    password=pending.password,
+                    referral_code=pending.referral_code,
+                )
+
+                # Cleanup pending
+                pending.delete()
+        except IntegrityError:
+            return Response({"error": "A user with this email or username already exists."}, status=400)
+
+        profile = user.userprofile
+        return Response({
+            "msg": "User registered successfully",
+            "referral_code": profile.referral_code,
+            "referral_link": profile.referral_link,
+            "referred_by": profile.referred_by.user.username if profile.referred_by else None,
+        }, status=201)
 
-        if pending.is_expired():
-            pending.delete()
-            return Response({"error": "OTP has expired."}, status=400)
 
-        if data["otp"] != pending.otp:
-            return Response({"error": "Invalid OTP."}, status=400)
 
-        # All checks passed – create the user
-        payload = {
-            "username": pending.username,
-            "email": pending.email,
-            "password": pending.password,
-            "confirm_password": pending.password,
-            "referral_code": pending.referral_code,
-        }
+#Referral Link View
+class ReferralLinkView(ConditionalGetMixin, APIView):
+    permission_classes = [IsAuthenticated]
 
-        serializer = RegisterSerializer(data=payload)
-        if serializer.is_valid():
-            user = serializer.save()
+    def get(self, request):
+        # Read fresh rather than from the user cache so the body matches the ETag
+        referral_code = UserProfile.objects.filter(user=request.user).values_list('referral_code', flat=True).get()
 
-            profile = user.userprofile
-            profile.referral_code = profile.generate_referral_code()
-            profile.referral_link = profile.generate_referral_link()
-            profile.save()
+        # Generate the referral link using the referral code
+        referral_link = referral_link_for(referral_code)
 
-            # Cleanup pending
-            pending.delete()
+        return Response({"referral_link": referral_link}, status=200)
 
-            refresh = RefreshToken.for_user(user)
-            return Response({
-                "msg": "User registered successfully",
-                "referral_code": profile.referral_code,
-                "referral_link": profile.referral_link,
-                "referred_by": profile.referred_by.user.username if profile.referred_by else None,
-            }, status=201)
 
-        return Response(serializer.errors, status=400)
+#Referral Tree Views
+class ReferralDownlineView(APIView):
+    permission_classes = [IsAuthenticated]
 
+    def get(self, request):
+        profile_id = request.user.userprofile.id
+        histogram = referral_tree.depth_histogram(profile_id)
+        return Response({
+            "downline_size": sum(histogram.values()),
+            "depth_histogram": histogram,
+        }, status=200)
 
 
-#Referral Link View
-class ReferralLinkView(APIView):
+class TopReferrersView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        # Get the user's profile
-        user_profile = request.user.userprofile
+        try:
+            limit = min(max(int(request.query_params.get("limit", 10)), 1), 100)
+        except ValueError:
+            return Response({"error": "limit must be an integer."}, status=400)
+        return Response({"results": referral_tree.top_referrers(limit)}, status=200)
 
-        # Generate the referral link using the referral code
-        referral_link = user_profile.generate_referral_link()
 
-        return Response({"referral_link": referral_link}, status=200)
+#Leaderboard Views
+class LeaderboardView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get("limit", 10)), 1), 100)
+        except ValueError:
+            return Response({"error": "limit must be an integer."}, status=400)
+        return Response({"results": with_usernames(leaderboard.top(limit))}, status=200)
+
+
+class MyLeaderboardRankView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            radius = min(max(int(request.query_params.get("around", 5)), 0), 50)
+        except ValueError:
+            return Response({"error": "around must be an integer."}, status=400)
+        rank, entries = leaderboard.around(request.user.userprofile.id, radius)
+        if rank is None:
+            return Response({"error": "Profile not ranked yet."}, status=404)
+        return Response({"rank": rank, "neighbours": with_usernames(entries)}, status=200)
+
+
+class CountryLeaderboardView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get("limit", 10)), 1), 100)
+        except ValueError:
+            return Response({"error": "limit must be an integer."}, status=400)
+        profile = request.user.userprofile
+        if not profile.country:
+            return Response({"error": "Set your country to join a country leaderboard."}, status=400)
+        rank, _neighbours = leaderboard.around(profile.id, 0, country=profile.country)
+        return Response({
+            "country": profile.country.code,
+            "rank": rank,
+            "results": with_usernames(leaderboard.top(limit, country=profile.country)),
+        }, status=200)
 
 
 #Referral Code View
-class ReferralCodeView(APIView):
+class ReferralCodeView(ConditionalGetMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        # Get the user's referral code
-        referral_code = request.user.userprofile.referral_code
+        # Get the user's referral code (fresh, not from the user cache, to match the ETag)
+        referral_code = UserProfile.objects.filter(user=request.user).values_list('referral_code', flat=True).get()
 
         return Response({"referral_code": referral_code}, status=200)
 # -------------------------------
@@ -201,6 +275,49 @@ class LoginView(APIView):
         })
 
 
+async def async_login_view(request):
+    """
+    Async-native twin of LoginView for ASGI deployments: the user lookup uses
+    the async ORM and the password hash is verified in a process pool, so a
+    login never blocks the event loop on PBKDF2.
+    """
+    if request.method != "POST":
+        return JsonResponse({"detail": "Method not allowed."}, status=405)
+
+    try:
+        payload = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"detail": "Invalid JSON body."}, status=400)
+
+    serializer = LoginCredentialsSerializer(data=payload)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+    data = serializer.validated_data
+
+    try:
+        user = await CustomUser.objects.aget(email=data['email'], username=data['username'])
+    except CustomUser.DoesNotExist:
+        return JsonResponse({"detail": [_("No User is available with that email + username.")]}, status=400)
+
+    if not await acheck_password(user, data['password']):
+        return JsonResponse({"non_field_errors": ["Password is incorrect"]}, status=400)
+
+    if not user.is_active:
+        return JsonResponse({"non_field_errors": ["User account is disabled"]}, status=400)
+
+    refresh = await sync_to_async(RefreshToken.for_user)(user)
+    if data.get('remember_me'):
+        refresh.set_exp(lifetime=timedelta(days=30))
+
+    return JsonResponse({
+        "access": str(refresh.access_token),
+        "refresh": str(refresh)
+    })
+
+# Token auth only, like the DRF views; csrf_exempt() can't wrap coroutines on Django 4.2.
+async_login_view.csrf_exempt = True
+
+
 # -------------------------------
 #         Send / Resend OTP
 # -------------------------------
@@ -215,21 +332,15 @@ class SendOTPView(APIView):
             email = serializer.validated_data['email']
             otp = str(random.randint(100000, 999999))
 
-            # Set OTP and expiry (5 minutes from now)
-            otp_storage[email] = {
-                "otp": otp,
-                "expires_at": timezone.now() + timedelta(minutes=5)
-            }
+            # Store the hashed OTP; it expires after settings.OTP_TTL_SECONDS
+            store = get_otp_store()
+            store.issue(email, otp)
 
             subject = 'Your OTP for Registration / Password Reset'
-            message = f'Your OTP is: {otp} (valid for 5 minutes)'
-            from_email = settings.DEFAULT_FROM_EMAIL
+            message = f'Your OTP is: {otp} (valid for {max(store.ttl // 60, 1)} minutes)'
 
-            try:
-                send_mail(subject, message, from_email, [email])
-                return Response({"msg": "OTP sent to email"}, status=200)
-            except Exception:
-                return Response({"error": "Failed to send OTP"}, status=500)
+            enqueue_mail(subject, message, [email])
+            return Response({"msg": "OTP sent to email"}, status=200)
 
         return Response(serializer.errors, status=400)
 
@@ -255,16 +366,12 @@ class ResendOTPView(APIView):
         pending.expires_at = timezone.now() + timedelta(minutes=5)
         pending.save()
 
-        try:
-            send_mail(
-                subject="Resend OTP",
-                message=f"Your new OTP is: {otp}",
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[email],
-            )
-            return Response({"msg": "OTP resent successfully."}, status=200)
-        except Exception as e:
-            return Response({"error": f"Failed to send OTP: {str(e)}"}, status=500)
+        enqueue_mail(
+            subject="Resend OTP",
+            message=f"Your new OTP is: {otp}",
+            recipient_list=[email],
+        )
+        return Response({"msg": "OTP resent successfully."}, status=200)
 
 
 # -------------------------------
@@ -281,20 +388,18 @@ class VerifyOTPView(APIView):
         if not email or not otp:
             return Response({"error": "Email and OTP are required."}, status=400)
 
-        otp_data = otp_storage.get(email)
-        if not otp_data:
-            return Response({"error": "OTP not sent or expired."}, status=400)
-
-        if timezone.now() > otp_data["expires_at"]:
-            otp_storage.pop(email, None)
+        result = get_otp_store().verify(email, otp)
+        if result == OTP_EXPIRED:
             return Response({"error": "OTP has expired."}, status=400)
-
-        if otp != otp_data["otp"]:
+        if result == OTP_INVALID:
             return Response({"error": "Invalid OTP."}, status=400)
+        if result == OTP_LOCKED:
+            return Response({"error": "Too many attempts. Please request a new OTP."}, status=429)
+        if result != OTP_OK:
+            return Response({"error": "OTP not sent or expired."}, status=400)
 
-        # ✅ Mark email as verified
-        verified_email["user"] = email
-        otp_storage.pop(email, None)
+        # ✅ Mark email as verified (one use, expires with the OTP TTL)
+        get_otp_store().mark_verified(email)
 
         return Response({"msg": "OTP verified successfully."}, status=200)
 
@@ -310,12 +415,12 @@ class ResetPasswordView(APIView):
     permission_classes = [AllowAny]
 
     def post(self, request):
-        email = verified_email.get("user")
+        email = request.data.get("email")
         new_password = request.data.get("new_password")
         confirm_password = request.data.get("confirm_password")
 
         if not email:
-            return Response({"error": "OTP not verified"}, status=400)
+            return Response({"error": "Email is required"}, status=400)
         if not new_password or not confirm_password:
             return Response({"error": "Both passwords are required"}, status=400)
         if new_password != confirm_password:
@@ -323,14 +428,15 @@ class ResetPasswordView(APIView):
         if len(new_password) < 8:
             return Response({"error": "Password too short"}, status=400)
 
+        # Consumes the verified marker, so one verify-otp allows one reset
+        if not get_otp_store().consume_verified(email):
+            return Response({"error": "OTP not verified"}, status=400)
+
         try:
             user = CustomUser.objects.get(email=email)
             user.set_password(new_password)
             user.save()
 
-            # Remove verified marker
-            verified_email.pop("user", None)
-
             return Response({"msg": "Password updated successfully"}, status=200)
         except CustomUser.DoesNotExist:
             return Response({"error": "User not found"}, status=404)
@@ -365,26 +471,29 @@ class DeleteAccountView(APIView):
 # -------------------------------
 #      User Profile (Get/Put)
 # -------------------------------
-class UserProfileView(APIView):
+class UserProfileView(ConditionalGetMixin, APIView):
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
+    def get_etag_parts(self, request, *args, **kwargs):
+        # Hearts regenerate without a write, so they are part of the ETag.
+        # The version is read before the snapshot, which get() then reuses.
+        parts = super().get_etag_parts(request, *args, **kwargs)
         try:
-            profile = request.user.userprofile
-            serializer = UserProfileSerializer(profile)
-            return Response({
-                "username": profile.user.username,
-                "referral_code": profile.referral_code,
-                "referral_link": profile.generate_referral_link(),
-                "referred_by": profile.referred_by.user.username if profile.referred_by else None,
-                **serializer.data  # Include other profile details from UserProfileSerializer
-            }, status=200)
+            self.snapshot = profile_snapshot(request.user.pk)
         except UserProfile.DoesNotExist:
+            return None
+        return [*parts, self.snapshot["hearts"]]
+
+    def get(self, request):
+        snapshot = getattr(self, "snapshot", None)
+        if snapshot is None:
             return Response({"error": "Profile not found"}, status=404)
+        # Cached per profile version; see snapshots.py
+        return Response(snapshot, status=200)
 
     def put(self, request):
         try:
-            profile = request.user.userprofile
+            profile = load_profile(request.user.pk)
             serializer = UserProfileSerializer(profile, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
@@ -416,7 +525,7 @@ class UserProfileView(APIView):
 #             return Response(serializer.data, status=200)
 #         return Response(serializer.errors, status=400)
 
-class UserProfileUpdateView(APIView):
+class UserProfileUpdateView(ConditionalGetMixin, APIView):
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
 
@@ -429,7 +538,8 @@ class UserProfileUpdateView(APIView):
         return Response(serializer.errors, status=400)
 
     def get(self, request):
-        user_profile = request.user.userprofile
+        # Read fresh rather than from the user cache so the body matches the ETag
+        user_profile = UserProfile.objects.get(user=request.user)
         serializer = UserProfileUpdateSerializer(user_profile)
         return Response(serializer.data, status=200)
 
@@ -456,17 +566,85 @@ class DeleteProfilePictureView(APIView):
 
 
 
+# -------------------------------
+#            Hearts
+# -------------------------------
+class SpendHeartsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            count = int(request.data.get("count", 1))
+        except (TypeError, ValueError):
+            return Response({"error": "count must be an integer."}, status=400)
+        if count < 1:
+            return Response({"error": "count must be at least 1."}, status=400)
+
+        profile = request.user.userprofile
+        try:
+            spent = spend_hearts(profile, count)
+        except HeartsBusy:
+            return Response({"error": "Please try again."}, status=409)
+        if not spent:
+            return Response({"error": "Not enough hearts."}, status=409)
+
+        profile.refresh_from_db(fields=["hearts", "hearts_refilled_at"])
+        return Response({"spent": spent, "hearts": profile.current_hearts()}, status=200)
+
+
+
+# -------------------------------
+#       Progress ingestion
+# -------------------------------
+class ProgressEventsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = ProgressBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        try:
+            summary = ingest_events(request.user.userprofile, serializer.validated_data["events"])
+        except IntegrityError:
+            return Response({"error": "Some of these events are already being processed."}, status=409)
+        except HeartsBusy:
+            return Response({"error": "Please try again."}, status=409)
+        return Response(summary, status=200)
+
+
+
 #discount
 # List all your own discounts
-class UserDiscountListView(generics.ListAPIView):
+class UserDiscountListView(ConditionalGetMixin, generics.ListAPIView):
     serializer_class = UserDiscountSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def active_only(self):
+        # ?active=true: only what can still be applied at checkout
+        return self.request.query_params.get("active", "").lower() in ("1", "true")
+
+    def get_etag_parts(self, request, *args, **kwargs):
+        # Expiry changes the active list without any write, so no ETag for it
+        return None if self.active_only() else super().get_etag_parts(request, *args, **kwargs)
+
     def get_queryset(self):
-        return UserDiscount.objects.filter(user_profile=self.request.user.userprofile)
+        profile = self.request.user.userprofile
+        if self.active_only():
+            return applicable_discounts(profile).order_by("-percent", "id")
+        return UserDiscount.objects.filter(user_profile=profile)
+
+# The single best discount to apply at checkout
+class BestDiscountView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        discount = best_discount(request.user.userprofile)
+        if discount is None:
+            return Response({"detail": "No discount available."}, status=404)
+        return Response(UserDiscountSerializer(discount).data, status=200)
 
 # Retrieve a specific discount (must be your own)
-class UserDiscountDetailView(generics.RetrieveAPIView):
+class UserDiscountDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     serializer_class = UserDiscountSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -492,18 +670,74 @@ class UseDiscountView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, pk):
-        try:
-            discount = UserDiscount.objects.get(pk=pk, user_profile=request.user.userprofile)
-        except UserDiscount.DoesNotExist:
-            return Response({"detail": "Discount not found."}, status=404)
+        profile = request.user.userprofile
+        if redeem(profile, pk):
+            return Response({"detail": "Discount applied successfully."}, status=200)
 
+        # Only failed redemptions pay for telling "missing" from "already used".
+        discount = UserDiscount.objects.filter(pk=pk, user_profile=profile).first()
+        if discount is None:
+            return Response({"detail": "Discount not found."}, status=404)
         if discount.used:
             return Response({"detail": "Discount already used."}, status=400)
+        return Response({"detail": "Discount has expired."}, status=400)
+
+# Apply several discounts in one checkout (all or nothing)
+class UseDiscountsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = RedeemDiscountsSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        try:
+            redeemed = redeem_many(request.user.userprofile, serializer.validated_data["ids"])
+        except DiscountUnavailable as e:
+            return Response(
+                {"detail": "Some discounts are missing, used or expired.", "unavailable": e.discount_ids},
+                status=409,
+            )
+        return Response({"detail": "Discounts applied successfully.", "redeemed": redeemed}, status=200)
+
+# Admin/staff: Queue one campaign discount for every matching profile
+class AdminGrantCampaignView(APIView):
+    permission_classes = [permissions.IsAdminUser]
 
-        discount.used = True
-        discount.used_at = timezone.now()
-        discount.save()
-        return Response({"detail": "Discount applied successfully."}, status=200)
+    def post(self, request):
+        serializer = CampaignGrantSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        data = serializer.validated_data
+        try:
+            # Run by the `grant_campaign --pending` worker, which checkpoints
+            # progress on the run so a restart resumes instead of losing it.
+            run = queue_campaign(
+                data["campaign_id"], data["percent"], data["reason"], country=data.get("country"),
+                min_level=data.get("min_level"), max_level=data.get("max_level"),
+                expires_at=data.get("expires_at"),
+            )
+        except CampaignRunning:
+            return Response({"detail": "This campaign is already running."}, status=409)
+        return Response({"campaign_id": run.campaign_id, "status": run.status}, status=202)
+
+# Admin/staff: A campaign's run state and how many profiles it has reached so far
+class AdminCampaignStatusView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, campaign_id):
+        run = CampaignRun.objects.filter(campaign_id=campaign_id).first()
+        granted = campaign_size(campaign_id)
+        if run is None and not granted:
+            return Response({"detail": "Campaign not found."}, status=404)
+        return Response({
+            "campaign_id": campaign_id,
+            "status": run.status if run else None,
+            "last_id": run.last_id if run else None,
+            "error": run.error if run else "",
+            "updated_at": run.updated_at if run else None,
+            "finished_at": run.finished_at if run else None,
+            "granted": granted,
+        }, status=200)
 
 # (Optional) Delete a discount (admin only)
 class AdminDeleteDiscountView(generics.DestroyAPIView):
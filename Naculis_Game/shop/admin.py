@@ -1,3 +1,25 @@
 from django.contrib import admin
+from .models import CatalogItem, Bundle, BundleItem
 
-# Register your models here.
+
+@admin.register(CatalogItem)
+class CatalogItemAdmin(admin.ModelAdmin):
+    list_display = ['sku', 'name', 'kind', 'quantity', 'price_gems', 'price_balance', 'is_active', 'sort_order']
+    list_filter = ['kind', 'is_active']
+    list_editable = ['is_active', 'sort_order']
+    search_fields = ['sku', 'name']
+
+
+class BundleItemInline(admin.TabularInline):
+    model = BundleItem
+    extra = 0
+    autocomplete_fields = ['item']
+
+
+@admin.register(Bundle)
+class BundleAdmin(admin.ModelAdmin):
+    list_display = ['sku', 'name', 'price_gems', 'price_balance', 'is_active', 'sort_order']
+    list_filter = ['is_active']
+    list_editable = ['is_active', 'sort_order']
+    search_fields = ['sku', 'name']
+    inlines = [BundleItemInline]
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from .models import CatalogItem, Bundle, BundleItem
+from .serializers import CatalogItemSerializer, BundleSerializer
+
+
+VERSION_CACHE_KEY = "shop:catalog-version"
+
+
+def catalog_version_cache():
+    """The shared cache holding the version token (CATALOG_CACHE_ALIAS)."""
+    return caches[getattr(settings, "CATALOG_CACHE_ALIAS", "default")]
+
+
+def bump_version():
+    """Mark every process's copy of the catalog stale."""
+    catalog_version_cache().set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+    catalog_cache.expire()
+
+
+class CatalogCache:
+    """
+    In-process copy of the active catalog, tagged with the version token it
+    was built at. The token lives in a Django cache shared by all workers
+    (a system check in checks.py refuses process-local ones) and is replaced
+    whenever the catalog is edited (see signals.py), so processes notice
+    edits made elsewhere the next time they compare tokens, which is at
+    most every ``check_interval`` seconds. Serving a request otherwise
+    touches neither the database nor the shared cache.
+    """
+
+    def __init__(self, check_interval):
+        self.check_interval = check_interval
+        self._version = None
+        self._payload = None
+        self._etag = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _current_version(self):
+        cache = catalog_version_cache()
+        version = cache.get(VERSION_CACHE_KEY)
+        if version is None:
+            # Evicted or never set: start a new one (add() keeps a racing winner's).
+            cache.add(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+            version = cache.get(VERSION_CACHE_KEY)
+        return version
+
+    def _build(self):
+        items = CatalogItem.objects.filter(is_active=True)
+        bundles = Bundle.objects.filter(is_active=True).prefetch_related(
+            Prefetch('bundle_items', queryset=BundleItem.objects.select_related('item').order_by('id'))
+        )
+        payload = {
+            "items": CatalogItemSerializer(items, many=True).data,
+            "bundles": BundleSerializer(bundles, many=True).data,
+        }
+        # Content hash, so every process serving the same catalog agrees on it.
+        encoded = json.dumps(payload, cls=DjangoJSONEncoder, sort_keys=True).encode()
+        return payload, f'"{hashlib.sha256(encoded).hexdigest()[:32]}"'
+
+    def get(self):
+        """Return ``(payload, etag)`` for the current catalog."""
+        with self._lock:
+            now = time.monotonic()
+            if self._checked_at is None or now - self._checked_at >= self.check_interval:
+                version = self._current_version()
+                if version != self._version:
+                    self._payload, self._etag = self._build()
+                    self._version = version
+                self._checked_at = now
+            return self._payload, self._etag
+
+    def expire(self):
+        with self._lock:
+            self._version = None
+            self._checked_at = None
+
+
+catalog_cache = CatalogCache(check_interval=getattr(settings, "CATALOG_VERSION_CHECK_SECONDS", 5))
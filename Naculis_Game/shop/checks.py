@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+PROCESS_LOCAL_BACKENDS = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+@register(Tags.caches)
+def check_catalog_cache(app_configs, **kwargs):
+    # With a per-process cache an edit would only invalidate the worker that made it.
+    alias = getattr(settings, "CATALOG_CACHE_ALIAS", "default")
+    backend = settings.CACHES.get(alias, {}).get("BACKEND")
+    if backend is None or backend in PROCESS_LOCAL_BACKENDS:
+        return [Error(
+            f"CACHES['{alias}'] (used for the catalog version) must be a backend shared by all worker processes.",
+            hint="Use the database, Redis or Memcached cache backend.",
+            id="shop.E001",
+        )]
+    return []
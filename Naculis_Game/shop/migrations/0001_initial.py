@@ -0,0 +1,69 @@
+# Generated by Django 4.2.14 on 2026-10-18 07:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Bundle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sku', models.SlugField(max_length=64, unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True)),
+                ('price_gems', models.PositiveIntegerField(blank=True, null=True)),
+                ('price_balance', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('sort_order', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['sort_order', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CatalogItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sku', models.SlugField(max_length=64, unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True)),
+                ('kind', models.CharField(choices=[('hearts', 'Hearts'), ('gems', 'Gems'), ('booster', 'Booster')], max_length=16)),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('price_gems', models.PositiveIntegerField(blank=True, null=True)),
+                ('price_balance', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('sort_order', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['sort_order', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BundleItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('bundle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bundle_items', to='shop.bundle')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shop.catalogitem')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='bundle',
+            name='items',
+            field=models.ManyToManyField(related_name='bundles', through='shop.BundleItem', to='shop.catalogitem'),
+        ),
+        migrations.AddConstraint(
+            model_name='bundleitem',
+            constraint=models.UniqueConstraint(fields=('bundle', 'item'), name='unique_bundle_item'),
+        ),
+    ]
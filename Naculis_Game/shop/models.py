@@ -1,3 +1,60 @@
 from django.db import models
 
-# Create your models here.
+
+class CatalogItem(models.Model):
+    HEARTS = 'hearts'
+    GEMS = 'gems'
+    BOOSTER = 'booster'
+    KIND_CHOICES = [
+        (HEARTS, 'Hearts'),
+        (GEMS, 'Gems'),
+        (BOOSTER, 'Booster'),
+    ]
+    sku = models.SlugField(max_length=64, unique=True)
+    name = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    quantity = models.PositiveIntegerField(default=1)  # units granted per purchase
+    price_gems = models.PositiveIntegerField(null=True, blank=True)
+    price_balance = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    sort_order = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['sort_order', 'id']
+
+    def __str__(self):
+        return f"{self.name} ({self.sku})"
+
+
+class Bundle(models.Model):
+    sku = models.SlugField(max_length=64, unique=True)
+    name = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+    items = models.ManyToManyField(CatalogItem, through='BundleItem', related_name='bundles')
+    price_gems = models.PositiveIntegerField(null=True, blank=True)
+    price_balance = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    sort_order = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['sort_order', 'id']
+
+    def __str__(self):
+        return f"{self.name} ({self.sku})"
+
+
+class BundleItem(models.Model):
+    bundle = models.ForeignKey(Bundle, on_delete=models.CASCADE, related_name='bundle_items')
+    item = models.ForeignKey(CatalogItem, on_delete=models.CASCADE, related_name='+')
+    quantity = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['bundle', 'item'], name='unique_bundle_item'),
+        ]
+
+    def __str__(self):
+        return f"{self.bundle.sku}: {self.quantity} x {self.item.sku}"
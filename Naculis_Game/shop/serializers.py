@@ -0,0 +1,25 @@
+from rest_framework import serializers
+
+from .models import CatalogItem, Bundle, BundleItem
+
+
+class CatalogItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CatalogItem
+        fields = ['sku', 'name', 'description', 'kind', 'quantity', 'price_gems', 'price_balance']
+
+
+class BundleItemSerializer(serializers.ModelSerializer):
+    sku = serializers.CharField(source='item.sku', read_only=True)
+
+    class Meta:
+        model = BundleItem
+        fields = ['sku', 'quantity']
+
+
+class BundleSerializer(serializers.ModelSerializer):
+    items = BundleItemSerializer(source='bundle_items', many=True, read_only=True)
+
+    class Meta:
+        model = Bundle
+        fields = ['sku', 'name', 'description', 'items', 'price_gems', 'price_balance']
@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import CatalogItem, Bundle, BundleItem
+from .catalog import bump_version
+
+
+# Any catalog edit (admin or otherwise) invalidates the cached catalog
+@receiver([post_save, post_delete], sender=CatalogItem)
+@receiver([post_save, post_delete], sender=Bundle)
+@receiver([post_save, post_delete], sender=BundleItem)
+def invalidate_catalog(sender, **kwargs):
+    transaction.on_commit(bump_version)
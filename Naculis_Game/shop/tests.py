@@ -1,3 +1,96 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from User_Auth.models import CustomUser
+
+from .catalog import CatalogCache
+from .checks import check_catalog_cache
+from .models import Bundle, BundleItem, CatalogItem
+
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shop-tests'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CatalogViewTests(TestCase):
+    def setUp(self):
+        self.hearts = CatalogItem.objects.create(sku='hearts-5', name='5 hearts', kind=CatalogItem.HEARTS, quantity=5, price_gems=50)
+        bundle = Bundle.objects.create(sku='starter', name='Starter', price_gems=80)
+        BundleItem.objects.create(bundle=bundle, item=self.hearts, quantity=2)
+        # This process's cache, and another worker's, on a controlled clock.
+        self.clock = mock.patch('shop.catalog.time').start()
+        self.addCleanup(mock.patch.stopall)
+        self.clock.monotonic.return_value = 1000
+        self.local = CatalogCache(check_interval=5)
+        self.other = CatalogCache(check_interval=5)
+        mock.patch('shop.views.catalog_cache', self.local).start()
+        mock.patch('shop.catalog.catalog_cache', self.local).start()
+        self.client = APIClient()
+
+    def test_matching_etag_is_a_304_without_queries(self):
+        first = self.client.get('/api/shop/catalog/')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual([item['sku'] for item in first.data['items']], ['hearts-5'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/shop/catalog/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual((response.status_code, response['ETag']), (304, first['ETag']))
+
+    def test_etag_is_a_hash_of_the_content(self):
+        # Built separately, as by two workers: same catalog, same ETag.
+        self.assertEqual(self.local.get()[1], self.other.get()[1])
+        before = self.local.get()[1]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hearts.price_gems = 40
+            self.hearts.save()
+        self.assertNotEqual(self.local.get()[1], before)
+
+    def _admin_client(self):
+        admin = CustomUser.objects.create_superuser(username='shopadmin', email='shop@example.com', password='pass12345')
+        client = self.client_class()
+        client.force_login(admin)
+        return client
+
+    def test_admin_edit_reaches_other_workers_after_the_check_interval(self):
+        _, etag = self.other.get()
+        admin = self._admin_client()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = admin.post(f'/admin/shop/catalogitem/{self.hearts.pk}/change/', {
+                'sku': 'hearts-5', 'name': '5 hearts', 'description': '', 'kind': CatalogItem.HEARTS,
+                'quantity': 5, 'price_gems': 45, 'price_balance': '', 'sort_order': 0, 'is_active': 'on',
+            })
+        self.assertEqual(response.status_code, 302)
+
+        # The editing worker serves the change at once.
+        self.assertEqual(self.local.get()[0]['items'][0]['price_gems'], 45)
+        # Another worker keeps its copy until it next compares versions.
+        self.clock.monotonic.return_value = 1004
+        self.assertEqual(self.other.get()[1], etag)
+        self.clock.monotonic.return_value = 1005
+        payload, new_etag = self.other.get()
+        self.assertNotEqual(new_etag, etag)
+        self.assertEqual(payload['items'][0]['price_gems'], 45)
+
+    def test_admin_delete_reaches_other_workers_after_the_check_interval(self):
+        self.other.get()
+        admin = self._admin_client()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = admin.post(f'/admin/shop/catalogitem/{self.hearts.pk}/delete/', {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+
+        self.clock.monotonic.return_value = 1005
+        payload, _ = self.other.get()
+        self.assertEqual(payload['items'], [])
+        self.assertEqual(payload['bundles'][0]['sku'], 'starter')
+
+
+class CatalogCacheCheckTests(TestCase):
+    def test_process_local_cache_is_refused(self):
+        with override_settings(CACHES=LOCMEM_CACHES):
+            self.assertEqual([error.id for error in check_catalog_cache(None)], ['shop.E001'])
+
+    def test_shared_cache_passes(self):
+        self.assertEqual(check_catalog_cache(None), [])
@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import *
+
+urlpatterns = [
+    path('catalog/', CatalogView.as_view(), name='shop-catalog'),
+]
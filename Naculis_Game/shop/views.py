@@ -1,3 +1,22 @@
-from django.shortcuts import render
+from django.utils.http import parse_etags
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import AllowAny
 
-# Create your views here.
+from .catalog import catalog_cache
+
+
+# -------------------------------
+#           Catalog
+# -------------------------------
+class CatalogView(APIView):
+    permission_classes = [AllowAny]
+    authentication_classes = []  # public, and read on every app open
+
+    def get(self, request):
+        payload, etag = catalog_cache.get()
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+        if etag in if_none_match or "*" in if_none_match:
+            return Response(status=304, headers=headers)
+        return Response(payload, status=200, headers=headers)